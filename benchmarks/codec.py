@@ -0,0 +1,103 @@
+import timeit
+
+from oibot.api.send_message import (
+    Button,
+    Buttons,
+    Keyboard,
+    Markdown,
+    Message,
+    MsgType,
+)
+from oibot.codec import Codec
+
+EVENT = {
+    "op": 0,
+    "id": "C2C_MESSAGE_CREATE:kzmcsk4mwqpa1v2lpewdq8sixvonbcuhxm5yktqeqzqrqgz9stv8kyyo7ndhl",
+    "d": {
+        "id": "ROBOT1.0_kzmCSk4MWqpA1v2LPEWdq8SIXVoNbcUhXm5YKTQeQZQRQGz9StV8Kyyo7ndhL",
+        "content": "/weather 北京 明天",
+        "timestamp": "2026-06-28T12:00:00+08:00",
+        "author": {
+            "id": "E4F4AEA33253A2797FB897C50B81D7ED",
+            "user_openid": "E4F4AEA33253A2797FB897C50B81D7ED",
+            "union_openid": "E4F4AEA33253A2797FB897C50B81D7ED",
+        },
+        "attachments": [
+            {
+                "content_type": "image/png",
+                "filename": "9DA0C2E7F1CF8C25A1D5D42B6F9D7E2B.png",
+                "height": 1080,
+                "width": 1920,
+                "size": 482113,
+                "url": "https://multimedia.nt.qq.com.cn/download?appid=1407&fileid=abcdef",
+            }
+        ],
+        "message_scene": {"source": "default", "callback_data": ""},
+        "message_type": 0,
+    },
+    "t": "C2C_MESSAGE_CREATE",
+}
+
+MESSAGE = Message.markdown(
+    Markdown.content(
+        "# 天气预报\n\n**北京** 明天 晴 18°C ~ 27°C\n\n> 空气质量：良\n\n"
+        + Markdown.cmd_enter("/weather 上海")
+    ),
+    Keyboard.content(
+        *(
+            Buttons(
+                *(
+                    Button.callback(
+                        label=f"城市 {row}-{column}",
+                        visited_label="已选择",
+                        data={"city": f"{row}-{column}", "days": 3},
+                        unsupport_tips="请升级客户端",
+                        id=f"button-{row}-{column}",
+                    )
+                    for column in range(3)
+                )
+            )
+            for row in range(3)
+        )
+    ),
+)
+
+REQUEST = {
+    "content": None,
+    "msg_type": MsgType.MARKDOWN,
+    "markdown": MESSAGE["markdown"],
+    "keyboard": MESSAGE["keyboard"],
+    "embed": None,
+    "ark": None,
+    "media": None,
+    "message_reference": None,
+    "event_id": None,
+    "msg_id": EVENT["d"]["id"],
+    "msg_seq": 1,
+}
+
+
+def main(number: int = 20000) -> None:
+    codecs = [Codec.stdlib()]
+
+    try:
+        codecs.append(Codec.orjson())
+
+    except ImportError:
+        print("orjson is not installed, only the stdlib codec is measured")
+
+    event = Codec.stdlib().dumps(EVENT)
+
+    for codec in codecs:
+        decode = timeit.timeit(lambda: codec.loads(event), number=number)
+        encode = timeit.timeit(lambda: codec.dumps(REQUEST), number=number)
+
+        print(
+            f"{codec.name:>8}: "
+            f"decode event {decode / number * 1e6:7.2f} us, "
+            f"encode message {encode / number * 1e6:7.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
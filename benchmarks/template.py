@@ -0,0 +1,86 @@
+import timeit
+
+from oibot.api.send_message import (
+    Button,
+    Buttons,
+    Keyboard,
+    Markdown,
+    Message,
+    Template,
+)
+from oibot.codec import Codec
+
+KEYBOARD = Keyboard.content(
+    *(
+        Buttons(
+            *(
+                Button.callback(
+                    label=f"城市 {row}-{column}",
+                    visited_label="已选择",
+                    data={"city": f"{row}-{column}", "days": 3},
+                    unsupport_tips="请升级客户端",
+                    id=f"button-{row}-{column}",
+                )
+                for column in range(3)
+            )
+        )
+        for row in range(3)
+    )
+)
+
+TEMPLATE = Template(
+    Message.markdown(Markdown.content(Template.slot("content")), KEYBOARD)
+)
+
+CONTENT = "# 天气预报\n\n**北京** 明天 晴 18°C ~ 27°C"
+
+MSG_ID = "ROBOT1.0_kzmCSk4MWqpA1v2LPEWdq8SIXVoNbcUhXm5YKTQeQZQRQGz9StV8Kyyo7ndhL"
+
+
+def main(number: int = 20000) -> None:
+    codecs = [Codec.stdlib()]
+
+    try:
+        codecs.append(Codec.orjson())
+
+    except ImportError:
+        print("orjson is not installed, only the stdlib codec is measured")
+
+    for codec in codecs:
+
+        def build() -> bytes:
+            message = Message.markdown(Markdown.content(CONTENT), KEYBOARD).copy()
+
+            return codec.dumps(
+                {
+                    "content": None,
+                    "msg_type": message["msg_type"],
+                    "markdown": message["markdown"],
+                    "keyboard": message["keyboard"],
+                    "embed": None,
+                    "ark": None,
+                    "media": None,
+                    "message_reference": None,
+                    "event_id": None,
+                    "msg_id": MSG_ID,
+                    "msg_seq": 1,
+                }
+            )
+
+        def render() -> bytes:
+            return TEMPLATE.render(
+                codec.dumps, content=CONTENT, msg_id=MSG_ID, msg_seq=1
+            )
+
+        dict_tree = timeit.timeit(build, number=number)
+        template = timeit.timeit(render, number=number)
+
+        print(
+            f"{codec.name:>8}: "
+            f"dict tree {dict_tree / number * 1e6:7.2f} us, "
+            f"template {template / number * 1e6:7.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 import asyncio
+import json
+import os
+import random
+from functools import partial
 from http import HTTPMethod
-from typing import TYPE_CHECKING, TypedDict
+from time import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, TypedDict
+
+from oibot.log import logger
+from oibot.matcher import fire_and_forget
 
 if TYPE_CHECKING:
     from oibot.bot import OiBot
@@ -11,6 +19,133 @@ class AccessToken(TypedDict):
     expires_in: str
 
 
+class TokenStore:
+    __slots__ = ("path",)
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = path
+
+    def acquire(self) -> int:
+        import fcntl
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+        except BaseException:
+            os.close(fd)
+
+            raise
+
+        return fd
+
+    @staticmethod
+    def release(fd: int) -> None:
+        import fcntl
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def read(fd: int) -> dict[str, Any]:
+        os.lseek(fd, 0, os.SEEK_SET)
+
+        chunks = []
+
+        while chunk := os.read(fd, 65536):
+            chunks.append(chunk)
+
+        try:
+            return json.loads(b"".join(chunks) or b"{}")
+
+        except ValueError:
+            return {}
+
+    @staticmethod
+    def write(fd: int, tokens: dict[str, Any]) -> None:
+        data = json.dumps(tokens).encode("utf-8")
+
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+
+        while data:
+            data = data[os.write(fd, data) :]
+
+    def load(self, fd: int, app_id: str) -> AccessToken | None:
+        if (token := self.read(fd).get(app_id)) and (
+            expires_in := int(token["expires"] - time())
+        ) > 60:
+            return AccessToken(
+                access_token=token["access_token"], expires_in=str(expires_in)
+            )
+
+        return None
+
+    def save(self, fd: int, app_id: str, token: AccessToken) -> None:
+        tokens = {
+            key: value
+            for key, value in self.read(fd).items()
+            if value["expires"] > time()
+        }
+
+        tokens[app_id] = {
+            "access_token": token["access_token"],
+            "expires": time() + int(token["expires_in"]),
+        }
+
+        self.write(fd, tokens)
+
+    async def __call__(
+        self, app_id: str, fetch: Callable[[], Awaitable[AccessToken]]
+    ) -> AccessToken:
+        def release(task: asyncio.Future[Any], fd: int | None = None) -> None:
+            if task.cancelled() or task.exception() is not None:
+                if fd is not None:
+                    self.release(fd)
+
+            else:
+                self.release(task.result() if fd is None else fd)
+
+        acquire = asyncio.ensure_future(asyncio.to_thread(self.acquire))
+
+        try:
+            fd = await asyncio.shield(acquire)
+
+        except asyncio.CancelledError:
+            acquire.add_done_callback(release)
+
+            raise
+
+        pending: asyncio.Future[Any] = acquire
+
+        try:
+            pending = asyncio.ensure_future(asyncio.to_thread(self.load, fd, app_id))
+
+            if token := await asyncio.shield(pending):
+                return token
+
+            token = await fetch()
+
+            pending = asyncio.ensure_future(
+                asyncio.to_thread(self.save, fd, app_id, token)
+            )
+
+            await asyncio.shield(pending)
+
+            return token
+
+        finally:
+            if pending.done():
+                self.release(fd)
+
+            else:
+                pending.add_done_callback(partial(release, fd=fd))
+
+
 class AccessTokenMixin:
     futures: dict[tuple[str, str], asyncio.Future[str]] = {}
 
@@ -23,28 +158,98 @@ class AccessTokenMixin:
             json={"appId": app_id, "clientSecret": app_secret},
         )
 
+    async def acquire_access_token(
+        self: "OiBot", app_id: str, app_secret: str
+    ) -> AccessToken:
+        if (store := self.token_store) is None:
+            return await self.get_app_access_token(app_id, app_secret)
+
+        return await store(
+            app_id, lambda: self.get_app_access_token(app_id, app_secret)
+        )
+
     async def get_access_token(self: "OiBot", app_id: str, app_secret: str) -> str:
-        if future := self.futures.get(key := (app_id, app_secret)):
+        if future := (futures := self.futures).get(key := (app_id, app_secret)):
             return await future
 
+        futures[key] = future = asyncio.get_running_loop().create_future()
+
+        try:
+            result = await self.acquire_access_token(app_id, app_secret)
+
+        except BaseException as e:
+            futures.pop(key, None)
+
+            future.set_exception(e)
+            future.exception()
+
+            raise
+
+        future.set_result(access_token := result["access_token"])
+
+        self.schedule_refresh(futures, key, future, int(result["expires_in"]))
+
+        return access_token
+
+    def schedule_refresh(
+        self: "OiBot",
+        futures: dict[tuple[str, str], asyncio.Future[str]],
+        key: tuple[str, str],
+        future: asyncio.Future[str],
+        expires_in: int,
+    ) -> None:
         loop = asyncio.get_running_loop()
 
-        self.futures[key] = future = loop.create_future()
+        expires = loop.time() + expires_in
 
-        try:
-            result = await self.get_app_access_token(app_id, app_secret)
+        loop.call_later(
+            max(expires_in - 60, 0) + random.uniform(1, 30),
+            lambda: fire_and_forget(
+                self.refresh_access_token(futures, key, future, expires)
+            ),
+        )
 
-            future.set_result(access_token := result["access_token"])
+    async def refresh_access_token(
+        self: "OiBot",
+        futures: dict[tuple[str, str], asyncio.Future[str]],
+        key: tuple[str, str],
+        future: asyncio.Future[str],
+        expires: float,
+    ) -> None:
+        loop = asyncio.get_running_loop()
 
-            loop.call_later(
-                int(result["expires_in"]) - 60, lambda: self.futures.pop(key, None)
-            )
+        backoff = 1.0
 
-            return access_token
+        while futures.get(key) is future:
+            try:
+                result = await self.acquire_access_token(*key)
 
-        except BaseException as e:
-            self.futures.pop(key, None)
+            except Exception as e:
+                if (remaining := expires - loop.time()) <= backoff:
+                    logger.exception("failed to refresh access token: %s", e)
 
-            future.set_exception(e)
+                    if futures.get(key) is future:
+                        del futures[key]
 
-            raise
+                    return
+
+                logger.warning(
+                    "failed to refresh access token, retrying in %ss: %s", backoff, e
+                )
+
+                await asyncio.sleep(backoff * random.uniform(0.5, 1))
+
+                backoff = min(backoff * 2, remaining / 2)
+
+                continue
+
+            if futures.get(key) is not future:
+                return
+
+            futures[key] = refreshed = loop.create_future()
+
+            refreshed.set_result(result["access_token"])
+
+            self.schedule_refresh(futures, key, refreshed, int(result["expires_in"]))
+
+            return
@@ -1,15 +1,36 @@
 import asyncio
 import json
+import random
+import re
 from base64 import b64encode
 from datetime import timedelta
 from enum import IntEnum
-from functools import wraps
-from http import HTTPMethod
-from typing import TYPE_CHECKING, Any, Callable, Literal, NotRequired, Self, TypedDict
+from functools import partial, wraps
+from http import HTTPMethod, HTTPStatus
+from time import monotonic
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    ClassVar,
+    Container,
+    Iterable,
+    Literal,
+    NotRequired,
+    Self,
+    TypedDict,
+)
 from urllib.parse import quote
 from uuid import uuid4
 
-from oibot.api.upload_file import FileType
+from aiohttp import ClientResponseError
+
+from oibot.api.upload_file import FileType, MediaSource
+from oibot.limiter import retry_after
+from oibot.retry import throttled
+from oibot.scheduler import Priority
 
 if TYPE_CHECKING:
     from oibot.bot import OiBot
@@ -296,7 +317,7 @@ class Media(dict):
         cls,
         url: str | None = None,
         srv_send_msg: bool = False,
-        file_data: bytes | str | None = None,
+        file_data: bytes | str | MediaSource | None = None,
     ) -> Self:
         return cls(
             file_type=FileType.IMAGE,
@@ -310,7 +331,7 @@ class Media(dict):
         cls,
         url: str | None = None,
         srv_send_msg: bool = False,
-        file_data: bytes | str | None = None,
+        file_data: bytes | str | MediaSource | None = None,
     ) -> Self:
         return cls(
             file_type=FileType.VIDEO,
@@ -324,7 +345,7 @@ class Media(dict):
         cls,
         url: str | None = None,
         srv_send_msg: bool = False,
-        file_data: bytes | str | None = None,
+        file_data: bytes | str | MediaSource | None = None,
     ) -> Self:
         return cls(
             file_type=FileType.VOICE,
@@ -338,7 +359,7 @@ class Media(dict):
         cls,
         url: str | None = None,
         srv_send_msg: bool = False,
-        file_data: bytes | str | None = None,
+        file_data: bytes | str | MediaSource | None = None,
     ) -> Self:
         return cls(
             file_type=FileType.FILE,
@@ -377,6 +398,60 @@ def channel(channel_id: str) -> str:
     return f"<#{channel_id}>"
 
 
+class Template:
+    PATTERN: ClassVar[re.Pattern[bytes]] = re.compile(rb'"\\u0000(\w+)\\u0000"')
+
+    OPTIONAL: ClassVar[frozenset[str]] = frozenset(
+        {"message_reference", "event_id", "msg_id", "msg_seq"}
+    )
+
+    __slots__ = ("parts", "slots", "names", "required")
+
+    def __init__(self, message: Message) -> None:
+        if message.get("msg_type") == MsgType.MEDIA:
+            raise ValueError("media messages must be uploaded per target")
+
+        pieces = self.PATTERN.split(
+            json.dumps(
+                {
+                    **message,
+                    "message_reference": self.slot("message_reference"),
+                    "event_id": self.slot("event_id"),
+                    "msg_id": self.slot("msg_id"),
+                    "msg_seq": self.slot("msg_seq"),
+                },
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).encode("utf-8")
+        )
+
+        self.parts: tuple[bytes, ...] = tuple(pieces[0::2])
+        self.slots: tuple[str, ...] = tuple(
+            piece.decode("utf-8") for piece in pieces[1::2]
+        )
+        self.names = frozenset(self.slots)
+        self.required = self.names - self.OPTIONAL
+
+    @staticmethod
+    def slot(name: str) -> str:
+        return f"\x00{name}\x00"
+
+    def render(self, dumps: Callable[[Any], bytes], **values: Any) -> bytes:
+        if unknown := values.keys() - self.names:
+            raise ValueError(f"unknown template values {sorted(unknown)!r}")
+
+        if missing := self.required - values.keys():
+            raise ValueError(f"missing template values {sorted(missing)!r}")
+
+        chunks = [self.parts[0]]
+
+        for name, part in zip(self.slots, self.parts[1:]):
+            chunks.append(dumps(values.get(name)))
+            chunks.append(part)
+
+        return b"".join(chunks)
+
+
 class ExtInfo(TypedDict):
     ref_idx: str
 
@@ -387,70 +462,120 @@ class SendMessageResponse(TypedDict):
     ext_info: ExtInfo
 
 
-def token_bucket(
-    limit: int = 60, window: float | int | timedelta = timedelta(seconds=60)
+class BroadcastResult(TypedDict):
+    target: str
+    response: SendMessageResponse | None
+    error: Exception | None
+
+
+def rate_limit(
+    limit: int = 60,
+    window: float | int | timedelta = timedelta(seconds=60),
+    *,
+    key: str | None = None,
+    name: str | None = None,
+    burst: int = 1,
 ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
     if isinstance(window, timedelta):
         window = window.total_seconds()
 
-    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
-        buckets: set[asyncio.Future[None]] = set()
+    if not 1 <= burst <= limit:
+        raise ValueError("parameter `burst` must be between 1 and `limit`")
 
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
         @wraps(func)
-        async def wrapper(*args, **kwargs) -> Any:
-            if not kwargs.get("msg_id"):
-                while len(buckets) > limit:
-                    await asyncio.wait(buckets, return_when=asyncio.FIRST_COMPLETED)
+        async def wrapper(self: "OiBot", *args, **kwargs) -> Any:
+            if kwargs.get("msg_id"):
+                return await func(self, *args, **kwargs)
 
-                buckets.add(
-                    future := (loop := asyncio.get_running_loop()).create_future()
-                )
-
-                future.add_done_callback(buckets.discard)
+            limiter = self.tenant.limiter
 
-                loop.call_later(window, future.set_result, None)
+            if isinstance(deadline := kwargs.get("deadline"), timedelta):
+                deadline = deadline.total_seconds()
 
-            return await func(*args, **kwargs)
+            start = monotonic()
 
-        return wrapper
+            await limiter.acquire(
+                scope := (name or func.__qualname__, key and kwargs[key]),
+                limit,
+                window,
+                burst,
+                deadline,
+                priority := kwargs.get("priority", Priority.NORMAL),
+            )
 
-    return decorator
+            if deadline is not None:
+                kwargs["deadline"] = deadline - (monotonic() - start)
 
+            parent = throttled.get()
 
-def group_token_bucket(
-    limit: int = 20, window: float | int | timedelta = timedelta(seconds=60)
-) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
-    if isinstance(window, timedelta):
-        window = window.total_seconds()
+            async def throttle(e: ClientResponseError) -> None:
+                limiter.penalize(
+                    scope, limit, window, retry_after(e.headers, window / limit), burst
+                )
 
-    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
-        buckets: dict[str, set[asyncio.Future[None]]] = {}
+                if parent is not None:
+                    await parent(e)
 
-        @wraps(func)
-        async def wrapper(*args, **kwargs) -> Any:
-            if not kwargs.get("msg_id"):
-                bucket = buckets.setdefault(kwargs["group_openid"], set())
+                await limiter.acquire(
+                    scope,
+                    limit,
+                    window,
+                    burst,
+                    None if deadline is None else deadline - (monotonic() - start),
+                    priority,
+                )
 
-                while len(bucket) > limit:
-                    await asyncio.wait(bucket, return_when=asyncio.FIRST_COMPLETED)
+            token = throttled.set(throttle)
 
-                bucket.add(
-                    future := (loop := asyncio.get_running_loop()).create_future()
-                )
+            try:
+                return await func(self, *args, **kwargs)
 
-                future.add_done_callback(bucket.discard)
+            except ClientResponseError as e:
+                if e.status == HTTPStatus.TOO_MANY_REQUESTS:
+                    limiter.penalize(
+                        scope,
+                        limit,
+                        window,
+                        retry_after(e.headers, window / limit),
+                        burst,
+                    )
 
-                loop.call_later(window, future.set_result, None)
+                raise
 
-            return await func(*args, **kwargs)
+            finally:
+                throttled.reset(token)
 
         return wrapper
 
     return decorator
 
 
+def scheduled(func: Callable[..., Any]) -> Callable[..., Any]:
+    @wraps(func)
+    async def wrapper(
+        self: "OiBot",
+        *args,
+        priority: Priority = Priority.NORMAL,
+        deadline: float | int | timedelta | None = None,
+        **kwargs,
+    ) -> Any:
+        if kwargs.get("msg_id"):
+            return await func(self, *args, **kwargs)
+
+        return await self.tenant.scheduler(
+            partial(func, self, *args, **kwargs),
+            priority=priority,
+            target=kwargs.get("group_openid") or kwargs.get("openid"),
+            deadline=deadline,
+        )
+
+    return wrapper
+
+
 class SendMessageMixin:
-    @token_bucket()
+    @rate_limit(name="user")
+    @scheduled
     async def send_user_message(
         self: "OiBot",
         *,
@@ -490,8 +615,9 @@ class SendMessageMixin:
             },
         )
 
-    @group_token_bucket()
-    @token_bucket()
+    @rate_limit(20, key="group_openid", name="group")
+    @rate_limit(name="group")
+    @scheduled
     async def send_group_message(
         self: "OiBot",
         *,
@@ -529,14 +655,67 @@ class SendMessageMixin:
             },
         )
 
+    @rate_limit(name="user")
+    @scheduled
+    async def send_user_template(
+        self: "OiBot", *, openid: str, template: Template, **values: Any
+    ) -> SendMessageResponse:
+        if values.get("msg_seq") is None:
+            values["msg_seq"] = random.randrange(1, 1 << 31)
+
+        return await self(
+            HTTPMethod.POST,
+            f"/v2/users/{openid}/messages",
+            headers={
+                "Authorization": f"QQBot {await self.get_access_token(app_id=self.app_id, app_secret=self.app_secret)}",
+                "Content-Type": "application/json",
+            },
+            data=template.render(self.codec.dumps, **values),
+        )
+
+    @rate_limit(20, key="group_openid", name="group")
+    @rate_limit(name="group")
+    @scheduled
+    async def send_group_template(
+        self: "OiBot", *, group_openid: str, template: Template, **values: Any
+    ) -> SendMessageResponse:
+        if values.get("msg_seq") is None:
+            values["msg_seq"] = random.randrange(1, 1 << 31)
+
+        return await self(
+            HTTPMethod.POST,
+            f"/v2/groups/{group_openid}/messages",
+            headers={
+                "Authorization": f"QQBot {await self.get_access_token(app_id=self.app_id, app_secret=self.app_secret)}",
+                "Content-Type": "application/json",
+            },
+            data=template.render(self.codec.dumps, **values),
+        )
+
     async def send_message(
         self: "OiBot",
-        message: Message,
+        message: Message | Template,
         *,
         openid: str | None = None,
         group_openid: str | None = None,
         **kwargs,
     ) -> SendMessageResponse:
+        if isinstance(message, Template):
+            if openid:
+                return await self.send_user_template(
+                    openid=openid, template=message, **kwargs
+                )
+
+            elif group_openid:
+                return await self.send_group_template(
+                    group_openid=group_openid, template=message, **kwargs
+                )
+
+            else:
+                raise ValueError(
+                    "parameter `openid` or `group_openid` must be specified"
+                )
+
         msg = message.copy()
 
         if openid:
@@ -565,3 +744,75 @@ class SendMessageMixin:
 
         else:
             raise ValueError("parameter `openid` or `group_openid` must be specified")
+
+    async def broadcast(
+        self: "OiBot",
+        message: Message,
+        targets: Iterable[str] | AsyncIterable[str],
+        *,
+        scope: Literal["user", "group"] = "group",
+        concurrency: int = 8,
+        priority: Priority = Priority.LOW,
+        deadline: float | int | timedelta | None = None,
+        done: Container[str] | None = None,
+        **kwargs,
+    ) -> AsyncIterator[BroadcastResult]:
+        if concurrency < 1:
+            raise ValueError("parameter `concurrency` must be positive")
+
+        key = "group_openid" if scope == "group" else "openid"
+
+        async def iterate() -> AsyncIterator[str]:
+            if isinstance(targets, AsyncIterable):
+                async for target in targets:
+                    yield target
+
+            else:
+                for target in targets:
+                    yield target
+
+        async def send(target: str) -> BroadcastResult:
+            try:
+                return BroadcastResult(
+                    target=target,
+                    response=await self.send_message(
+                        message,
+                        **{key: target},
+                        priority=priority,
+                        deadline=deadline,
+                        **kwargs,
+                    ),
+                    error=None,
+                )
+
+            except Exception as e:
+                return BroadcastResult(target=target, response=None, error=e)
+
+        pending: set[asyncio.Task[BroadcastResult]] = set()
+
+        try:
+            async for target in iterate():
+                if done is not None and target in done:
+                    continue
+
+                if len(pending) >= concurrency:
+                    finished, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+
+                    for task in finished:
+                        yield task.result()
+
+                pending.add(asyncio.create_task(send(target)))
+
+            while pending:
+                finished, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in finished:
+                    yield task.result()
+
+        finally:
+            for task in pending:
+                task.cancel()
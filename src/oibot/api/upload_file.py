@@ -1,6 +1,24 @@
+import asyncio
+import json
+import os
+from base64 import b64encode
+from collections.abc import Buffer
 from enum import IntEnum
+from hashlib import blake2b
 from http import HTTPMethod
-from typing import TYPE_CHECKING, NotRequired, TypedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Hashable,
+    NotRequired,
+    TypedDict,
+)
+
+from oibot.cache import TTLCache
 
 if TYPE_CHECKING:
     from oibot.bot import OiBot
@@ -20,7 +38,236 @@ class UploadFileResponse(TypedDict):
     id: NotRequired[str]
 
 
+class MediaSource:
+    class Body:
+        __slots__ = ("source", "prefix")
+
+        def __init__(self, source: "MediaSource", fields: dict[str, Any]) -> None:
+            self.source = source
+            self.prefix = (
+                json.dumps(fields, ensure_ascii=False, separators=(",", ":"))[:-1]
+                + ',"file_data":"'
+            ).encode("utf-8")
+
+        @property
+        def length(self) -> int | None:
+            if (size := self.source.size) is None:
+                return None
+
+            return len(self.prefix) + (size + 2) // 3 * 4 + 2
+
+        @property
+        def replayable(self) -> bool:
+            return self.source.replayable
+
+        async def __aiter__(self) -> AsyncIterator[bytes]:
+            yield self.prefix
+
+            async for chunk in self.source:
+                yield chunk
+
+            yield b'"}'
+
+    __slots__ = ("source", "size", "chunk_size", "consumed")
+
+    def __init__(
+        self,
+        source: str | os.PathLike[str] | Buffer | AsyncIterable[bytes],
+        *,
+        size: int | None = None,
+        chunk_size: int = 3 << 16,
+    ) -> None:
+        if chunk_size <= 0 or chunk_size % 3:
+            raise ValueError("parameter `chunk_size` must be a positive multiple of 3")
+
+        if isinstance(source, (str, os.PathLike)):
+            size = os.path.getsize(source)
+
+        elif not isinstance(source, AsyncIterable):
+            source = memoryview(source).cast("B")
+            size = source.nbytes
+
+        self.source = source
+        self.size = size
+        self.chunk_size = chunk_size
+        self.consumed = False
+
+    @property
+    def replayable(self) -> bool:
+        return isinstance(self.source, (memoryview, str, os.PathLike))
+
+    @property
+    def key(self) -> Hashable | None:
+        match self.source:
+            case memoryview():
+                return blake2b(self.source, digest_size=16).digest()
+
+            case str() | os.PathLike():
+                stat = os.stat(self.source)
+
+                return (os.fspath(self.source), stat.st_size, stat.st_mtime_ns)
+
+            case _:
+                return None
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        match self.source:
+            case memoryview():
+                for offset in range(0, self.source.nbytes, self.chunk_size):
+                    yield b64encode(self.source[offset : offset + self.chunk_size])
+
+            case str() | os.PathLike():
+                with open(self.source, "rb") as f:
+                    while chunk := await asyncio.to_thread(f.read, self.chunk_size):
+                        yield b64encode(chunk)
+
+            case _:
+                if self.consumed:
+                    raise RuntimeError("async iterable media source cannot be replayed")
+
+                self.consumed = True
+
+                remainder = b""
+
+                async for chunk in self.source:
+                    if len(chunk := remainder + chunk) < 3:
+                        remainder = chunk
+
+                        continue
+
+                    cut = len(chunk) - len(chunk) % 3
+
+                    remainder = chunk[cut:]
+
+                    yield b64encode(chunk[:cut])
+
+                if remainder:
+                    yield b64encode(remainder)
+
+    def body(self, **fields: Any) -> Body:
+        return self.Body(self, fields)
+
+
+class UploadCache:
+    __slots__ = ("entries", "hits", "misses")
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.entries = TTLCache(maxsize=maxsize)
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def key(
+        target: tuple[str, str],
+        file_type: FileType,
+        url: str | None = None,
+        file_data: str | MediaSource | None = None,
+    ) -> Hashable | None:
+        if url:
+            return (*target, file_type, url)
+
+        if isinstance(file_data, MediaSource):
+            return None if (key := file_data.key) is None else (*target, file_type, key)
+
+        return (
+            *target,
+            file_type,
+            blake2b((file_data or "").encode("ascii"), digest_size=16).digest(),
+        )
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    async def __call__(
+        self, key: Hashable, upload: Callable[[], Awaitable[UploadFileResponse]]
+    ) -> UploadFileResponse:
+        if (future := self.entries.get(key)) is not None:
+            self.hits += 1
+
+            return await asyncio.shield(future)
+
+        self.misses += 1
+
+        self.entries.set(key, future := asyncio.get_running_loop().create_future())
+
+        try:
+            result = await upload()
+
+        except BaseException as e:
+            if self.entries.peek(key) is future:
+                self.entries.pop(key)
+
+            future.set_exception(e)
+            future.exception()
+
+            raise
+
+        if (ttl := int(result.get("ttl") or 0)) > 0:
+            self.entries.expire(key, ttl - min(60, ttl / 10))
+
+        future.set_result(result)
+
+        return result
+
+
 class UploadFileMixin:
+    async def upload_file(
+        self: "OiBot",
+        path: str,
+        target: tuple[str, str],
+        *,
+        file_type: FileType,
+        url: str | None = None,
+        srv_send_msg: bool = False,
+        file_data: str | MediaSource | None = None,
+    ) -> UploadFileResponse:
+        async def upload() -> UploadFileResponse:
+            headers = {
+                "Authorization": f"QQBot {await self.get_access_token(app_id=self.app_id, app_secret=self.app_secret)}"
+            }
+
+            if not isinstance(file_data, MediaSource):
+                return await self(
+                    HTTPMethod.POST,
+                    path,
+                    headers=headers,
+                    json={
+                        "file_type": file_type,
+                        "url": url,
+                        "srv_send_msg": srv_send_msg,
+                        "file_data": file_data,
+                    },
+                )
+
+            headers["Content-Type"] = "application/json"
+
+            body = file_data.body(
+                file_type=file_type, url=url, srv_send_msg=srv_send_msg
+            )
+
+            if (length := body.length) is not None:
+                headers["Content-Length"] = str(length)
+
+            return await self(
+                HTTPMethod.POST,
+                path,
+                headers=headers,
+                data=body,
+                attempts=1 if srv_send_msg else None,
+            )
+
+        if (
+            srv_send_msg
+            or (key := UploadCache.key(target, file_type, url, file_data)) is None
+        ):
+            return await upload()
+
+        return await self.tenant.uploads(key, upload)
+
     async def upload_user_file(
         self: "OiBot",
         *,
@@ -28,20 +275,15 @@ class UploadFileMixin:
         file_type: FileType,
         url: str | None = None,
         srv_send_msg: bool = False,
-        file_data: str | None = None,
+        file_data: str | MediaSource | None = None,
     ) -> UploadFileResponse:
-        return await self(
-            HTTPMethod.POST,
+        return await self.upload_file(
             f"/v2/users/{openid}/files",
-            headers={
-                "Authorization": f"QQBot {await self.get_access_token(app_id=self.app_id, app_secret=self.app_secret)}"
-            },
-            json={
-                "file_type": file_type,
-                "url": url,
-                "srv_send_msg": srv_send_msg,
-                "file_data": file_data,
-            },
+            ("user", openid),
+            file_type=file_type,
+            url=url,
+            srv_send_msg=srv_send_msg,
+            file_data=file_data,
         )
 
     async def upload_group_file(
@@ -51,18 +293,13 @@ class UploadFileMixin:
         file_type: FileType,
         url: str | None = None,
         srv_send_msg: bool = False,
-        file_data: str | None = None,
+        file_data: str | MediaSource | None = None,
     ) -> UploadFileResponse:
-        return await self(
-            HTTPMethod.POST,
+        return await self.upload_file(
             f"/v2/groups/{group_openid}/files",
-            headers={
-                "Authorization": f"QQBot {await self.get_access_token(app_id=self.app_id, app_secret=self.app_secret)}"
-            },
-            json={
-                "file_type": file_type,
-                "url": url,
-                "srv_send_msg": srv_send_msg,
-                "file_data": file_data,
-            },
+            ("group", group_openid),
+            file_type=file_type,
+            url=url,
+            srv_send_msg=srv_send_msg,
+            file_data=file_data,
         )
@@ -1,26 +1,34 @@
 import asyncio
-import json
 import logging
+import random
 from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
 from contextvars import ContextVar
+from datetime import timedelta
+from functools import partial
 from http import HTTPMethod, HTTPStatus
 from inspect import isasyncgenfunction, isgeneratorfunction
 from types import TracebackType
 from typing import Any, AsyncIterator, Iterable, Self
 
-from aiohttp import ClientSession, web
+from aiohttp import web
 from aiohttp.web_request import Request
 from aiohttp.web_response import Response
-from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 
-from oibot.api.access_token import AccessTokenMixin
+from oibot.api.access_token import AccessTokenMixin, TokenStore
 from oibot.api.interaction import InteractionMixin
 from oibot.api.recall_message import DeleteMessageMixin
 from oibot.api.send_message import SendMessageMixin
-from oibot.api.upload_file import UploadFileMixin
+from oibot.api.upload_file import MediaSource, UploadFileMixin
+from oibot.codec import Codec
+from oibot.dispatcher import Deduplicator, Dispatcher, Lanes
 from oibot.event import OP, Event
+from oibot.log import logger
 from oibot.matcher import ensure_async, fire_and_forget
-from oibot.plugin import PluginManager, SessionManager
+from oibot.plugin import Cache, PluginManager, SessionManager
+from oibot.pool import Pool
+from oibot.retry import Retry
+from oibot.signature import sign, verify
+from oibot.tenant import Tenant, Tenants
 
 
 class OiBot(
@@ -30,7 +38,23 @@ class OiBot(
     SendMessageMixin,
     UploadFileMixin,
 ):
-    __slots__ = ("app", "plugin_manager", "session_manager", "session")
+    __slots__ = (
+        "app",
+        "plugin_manager",
+        "tenants",
+        "token_store",
+        "retry",
+        "session",
+        "token_session",
+        "pool",
+        "token_pool",
+        "dispatcher",
+        "lanes",
+        "deduplicator",
+        "codec",
+        "verify_signature",
+        "signature_skew",
+    )
 
     def __init__(
         self,
@@ -38,11 +62,35 @@ class OiBot(
         *,
         app_id: str | None = None,
         app_secret: str | None = None,
+        dispatcher: Dispatcher | None = None,
+        lanes: Lanes | None = None,
+        deduplicator: Deduplicator | None = None,
+        codec: Codec | None = None,
+        verify_signature: bool = False,
+        signature_skew: float | int | timedelta | None = timedelta(minutes=5),
+        tenants: Tenants | None = None,
+        token_store: TokenStore | None = None,
+        retry: Retry | None = None,
+        pool: Pool | None = None,
+        token_pool: Pool | None = None,
         **kwargs,
     ) -> None:
+        self.codec = codec or Codec.default()
+        if isinstance(signature_skew, timedelta):
+            signature_skew = signature_skew.total_seconds()
+
+        self.verify_signature = verify_signature
+        self.signature_skew = signature_skew
+        self.token_store = token_store
+        self.retry = Retry() if retry is None else retry
+        self.pool = Pool() if pool is None else pool
+        self.token_pool = Pool(4) if token_pool is None else token_pool
+        self.dispatcher = dispatcher
+        self.lanes = lanes
+        self.deduplicator = deduplicator
 
         self.plugin_manager = plugin_manager = PluginManager()
-        self.session_manager = SessionManager()
+        self.tenants = Tenants(app_id, app_secret) if tenants is None else tenants
 
         if isinstance(plugins, str):
             plugin_manager.import_from(plugins)
@@ -54,11 +102,11 @@ class OiBot(
         self.app = app = web.Application(**kwargs)
 
         app.router.add_post(path="/", handler=self.handler)
+        app.router.add_post(path="/{app_id}", handler=self.handler)
 
         app["bot"] = self
 
-        app["app_id"] = ContextVar("app_id", default=app_id)
-        app["app_secret"] = ContextVar("app_secret", default=app_secret)
+        app["tenant"] = ContextVar("tenant", default=self.tenants.default)
 
         async def init_ctx(app: web.Application) -> AsyncIterator[None]:
             async with AsyncExitStack() as stack:
@@ -79,16 +127,21 @@ class OiBot(
                                 ).cancel
                             )
 
+                stack.push_async_callback(Cache.aclose_all)
+
                 yield
 
         app.cleanup_ctx.append(init_ctx)
 
     async def __aenter__(self) -> Self:
-        self.session = ClientSession(
-            base_url="https://api.sgroup.qq.com", raise_for_status=True
-        )
+        self.session = self.pool.session("https://api.sgroup.qq.com")
+        self.token_session = self.token_pool.session()
 
         await self.session.__aenter__()
+        await self.token_session.__aenter__()
+
+        if self.dispatcher:
+            await self.dispatcher.__aenter__()
 
         return self
 
@@ -98,73 +151,212 @@ class OiBot(
         exc_value: BaseException | None = None,
         traceback: TracebackType | None = None,
     ) -> None:
+        if self.dispatcher:
+            await self.dispatcher.__aexit__(exc_type, exc_value, traceback)
+
+        for tenant in self.tenants:
+            tenant.tokens.clear()
+
+        await self.token_session.__aexit__(exc_type, exc_value, traceback)
         await self.session.__aexit__(exc_type, exc_value, traceback)
 
-    async def __call__(self, method: HTTPMethod, url: str, **kwargs) -> Any:
-        logging.debug(f"{method=} {url=} {kwargs=}")
+    async def __call__(
+        self, method: HTTPMethod, url: str, *, attempts: int | None = None, **kwargs
+    ) -> Any:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "%s %s %r", method, url, kwargs, extra={"method": method, "url": url}
+            )
+
+        if (body := kwargs.pop("json", None)) is not None:
+            if "msg_seq" in body and body["msg_seq"] is None:
+                body = body | {"msg_seq": random.randrange(1, 1 << 31)}
+
+            if not self.retry.idempotent(method, url, body):
+                attempts = 1
+
+            kwargs["data"] = self.codec.dumps(body)
+            kwargs["headers"] = (kwargs.get("headers") or {}) | {
+                "Content-Type": "application/json"
+            }
+
+        session = (
+            self.token_session
+            if url.startswith("https://bots.qq.com/")
+            else self.session
+        )
+
+        async def request() -> Any:
+            async with session.request(method, url, **kwargs) as resp:
+                if data := await resp.read():
+                    return self.codec.loads(data)
+
+        if isinstance(data := kwargs.get("data"), MediaSource.Body) and not (
+            data.replayable
+        ):
+            attempts = 1
 
-        async with self.session.request(method, url, **kwargs) as resp:
-            if data := await resp.read():
-                return json.loads(data)
+        return await self.retry(method, url, request, attempts=attempts)
+
+    @property
+    def tenant(self) -> Tenant:
+        return self.app["tenant"].get()
 
     @property
     def app_id(self) -> str:
-        return self.app["app_id"].get()
+        return self.tenant.app_id
 
     @property
     def app_secret(self) -> str:
-        return self.app["app_secret"].get()
+        return self.tenant.app_secret
+
+    @property
+    def session_manager(self) -> SessionManager:
+        return self.tenant.session_manager
+
+    @property
+    def futures(self) -> dict[tuple[str, str], asyncio.Future[str]]:
+        return self.tenant.tokens
 
     async def handler(self, request: Request) -> Response:
-        ctx = await request.json()
+        if (
+            tenant := self.tenants.get(
+                request.match_info.get("app_id") or request.query.get("id"),
+                None if self.verify_signature else request.query.get("secret"),
+            )
+        ) is None:
+            return web.Response(body=None, status=HTTPStatus.NOT_FOUND)
+
+        self.app["tenant"].set(tenant)
 
-        logging.debug(ctx)
+        body = await request.read()
 
-        if id := request.query.get("id"):
-            self.app["app_id"].set(id)
+        if self.verify_signature:
+            if not (secret := tenant.app_secret) or not verify(
+                secret,
+                request.headers.get("X-Signature-Ed25519", ""),
+                request.headers.get("X-Signature-Timestamp", ""),
+                body,
+                skew=self.signature_skew,
+            ):
+                logger.warning("rejected webhook request with invalid signature")
 
-        if secret := request.query.get("secret"):
-            self.app["app_secret"].set(secret)
+                return web.Response(body=None, status=HTTPStatus.UNAUTHORIZED)
+
+        ctx = self.codec.loads(body)
+
+        logger.debug("%r", ctx)
 
         match ctx["op"]:
             case OP.MESSAGE:
-                if not self.session_manager(event := Event(self, ctx)):
-                    fire_and_forget(self.plugin_manager(event))
+                if self.deduplicator is not None and self.deduplicator(ctx):
+                    logger.debug("duplicate delivery dropped id=%s", ctx.get("id"))
+
+                elif not self.session_manager(event := Event(self, ctx)):
+                    job = partial(self.plugin_manager, event, tenant.plugins)
+
+                    forget = (
+                        None
+                        if self.deduplicator is None
+                        else partial(self.deduplicator.forget, ctx)
+                    )
+
+                    if self.lanes is not None:
+                        accepted = await self.lanes.submit(
+                            event, job, self.dispatcher, on_drop=forget
+                        )
+
+                    elif self.dispatcher:
+                        accepted = await self.dispatcher.submit(job, on_drop=forget)
+
+                    else:
+                        fire_and_forget(job())
+
+                        accepted = True
+
+                    if not accepted:
+                        if forget is not None:
+                            forget()
+
+                        logger.warning("dispatcher is saturated, rejected %r", event)
+
+                        return web.Response(
+                            body=None, status=HTTPStatus.SERVICE_UNAVAILABLE
+                        )
 
             case OP.VERIFICATION:
-                logging.info("webhook verification request received")
+                logger.info("webhook verification request received")
 
                 if not (secret := self.app_secret):
                     raise ValueError("parameter `app_secret` must be specified")
 
-                secret = secret.encode("utf-8")
-
-                while len(secret) < 32:
-                    secret *= 2
-
                 d = ctx["d"]
 
-                return web.json_response(
-                    {
-                        "plain_token": d["plain_token"],
-                        "signature": (
-                            Ed25519PrivateKey.from_private_bytes(secret[:32])
-                            .sign(f"{d['event_ts']}{d['plain_token']}".encode("utf-8"))
-                            .hex()
-                        ),
-                    }
+                return web.Response(
+                    body=self.codec.dumps(
+                        {
+                            "plain_token": d["plain_token"],
+                            "signature": sign(
+                                secret,
+                                f"{d['event_ts']}{d['plain_token']}".encode("utf-8"),
+                            ),
+                        }
+                    ),
+                    content_type="application/json",
                 )
 
             case _:
-                logging.warning(f"invalid type received {ctx=}")
+                logger.warning("invalid type received ctx=%r", ctx)
 
         return web.Response(body=None, status=HTTPStatus.OK)
 
-    async def serve(self, *, host="0.0.0.0", port=8080, **kwargs):
+    async def warmup(self) -> None:
+        async def fetch(tenant: Tenant) -> None:
+            self.app["tenant"].set(tenant)
+
+            try:
+                await self.get_access_token(tenant.app_id, tenant.app_secret)
+
+            except Exception as e:
+                logger.warning("failed to fetch access token for %r: %r", tenant, e)
+
+        await asyncio.gather(
+            self.pool.warmup(self.session, "/"),
+            *(
+                fetch(tenant)
+                for tenant in (
+                    self.tenants.default,
+                    *(self.tenants.get(app_id) for app_id in self.tenants.configs),
+                )
+                if tenant and tenant.app_id and tenant.app_secret
+            ),
+        )
+
+    async def serve(
+        self,
+        *,
+        host="0.0.0.0",
+        port=8080,
+        warmup_timeout: float | int | timedelta = 10,
+        **kwargs,
+    ):
+        if isinstance(warmup_timeout, timedelta):
+            warmup_timeout = warmup_timeout.total_seconds()
+
         async with self:
             runner = web.AppRunner(self.app, **kwargs)
 
             try:
+                try:
+                    async with asyncio.timeout(warmup_timeout):
+                        await self.warmup()
+
+                except TimeoutError:
+                    logger.warning(
+                        "warm-up did not finish within %ss, starting anyway",
+                        warmup_timeout,
+                    )
+
                 await runner.setup()
 
                 site = web.TCPSite(runner, host, port)
@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from datetime import timedelta
+from time import monotonic
+from typing import Any, Callable, Hashable, Iterator
+
+
+class TTLCache:
+    class Entry:
+        __slots__ = ("value", "expires")
+
+        def __init__(self, value: Any, expires: float | None) -> None:
+            self.value = value
+            self.expires = expires
+
+    __slots__ = ("entries", "ttl", "maxsize", "evictable", "on_evict", "swept")
+
+    def __init__(
+        self,
+        ttl: float | int | timedelta | None = None,
+        maxsize: int | None = None,
+        *,
+        evictable: Callable[[Any], bool] | None = None,
+        on_evict: Callable[[Hashable, Any], Any] | None = None,
+    ) -> None:
+        if isinstance(ttl, timedelta):
+            ttl = ttl.total_seconds()
+
+        self.entries: OrderedDict[Hashable, TTLCache.Entry] = OrderedDict()
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.evictable = evictable
+        self.on_evict = on_evict
+        self.swept = monotonic()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self.entries))
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.lookup(key, monotonic(), touch=False) is not None
+
+    def values(self) -> list[Any]:
+        return [entry.value for entry in self.entries.values()]
+
+    def expiry(self, ttl: float | None, now: float) -> float | None:
+        return None if ttl is None else now + ttl
+
+    def lookup(
+        self, key: Hashable, now: float, *, touch: bool = True
+    ) -> "TTLCache.Entry | None":
+        if self.ttl is not None and now - self.swept >= self.ttl:
+            self.sweep(now)
+
+        if (entry := self.entries.get(key)) is None:
+            return None
+
+        if (
+            entry.expires is not None
+            and entry.expires <= now
+            and not self.renew(key, entry, now)
+        ):
+            return None
+
+        if touch:
+            self.entries.move_to_end(key)
+
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if (entry := self.lookup(key, monotonic())) is None:
+            return default
+
+        return entry.value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        if (entry := self.lookup(key, monotonic(), touch=False)) is None:
+            return default
+
+        return entry.value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        now = monotonic()
+
+        self.entries[key] = self.Entry(value, self.expiry(self.ttl, now))
+        self.entries.move_to_end(key)
+
+        if self.maxsize is not None:
+            for _ in range(len(self.entries)):
+                if len(self.entries) <= self.maxsize:
+                    break
+
+                if (oldest := next(iter(self.entries))) == key:
+                    break
+
+                if not self.evict(oldest):
+                    entry = self.entries[oldest]
+                    entry.expires = self.expiry(self.ttl, now)
+
+                    self.entries.move_to_end(oldest)
+
+    def expire(self, key: Hashable, ttl: float | int | timedelta | None) -> None:
+        if isinstance(ttl, timedelta):
+            ttl = ttl.total_seconds()
+
+        if (entry := self.entries.get(key)) is not None:
+            entry.expires = self.expiry(ttl, monotonic())
+
+    def renew(self, key: Hashable, entry: "TTLCache.Entry", now: float) -> bool:
+        if self.evict(key):
+            return False
+
+        entry.expires = self.expiry(self.ttl, now)
+
+        return True
+
+    def evict(self, key: Hashable) -> bool:
+        if (entry := self.entries.get(key)) is None:
+            return True
+
+        if self.evictable is not None and not self.evictable(entry.value):
+            return False
+
+        del self.entries[key]
+
+        if self.on_evict is not None:
+            self.on_evict(key, entry.value)
+
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if (entry := self.entries.pop(key, None)) is None:
+            return default
+
+        return entry.value
+
+    def sweep(self, now: float | None = None) -> None:
+        if now is None:
+            now = monotonic()
+
+        self.swept = now
+
+        for key, entry in list(self.entries.items()):
+            if entry.expires is not None and entry.expires <= now:
+                self.renew(key, entry, now)
+
+    def clear(self) -> None:
+        for key in list(self.entries):
+            self.evict(key)
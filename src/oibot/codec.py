@@ -0,0 +1,43 @@
+import json
+from typing import Any, Callable
+
+
+class Codec:
+    __slots__ = ("name", "loads", "dumps")
+
+    def __init__(
+        self,
+        name: str,
+        loads: Callable[[bytes | str], Any],
+        dumps: Callable[[Any], bytes],
+    ) -> None:
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.name!r})"
+
+    @classmethod
+    def stdlib(cls) -> "Codec":
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+        return cls(
+            "json",
+            json.loads,
+            lambda obj: encoder.encode(obj).encode("utf-8"),
+        )
+
+    @classmethod
+    def orjson(cls) -> "Codec":
+        import orjson
+
+        return cls("orjson", orjson.loads, orjson.dumps)
+
+    @classmethod
+    def default(cls) -> "Codec":
+        try:
+            return cls.orjson()
+
+        except ImportError:
+            return cls.stdlib()
@@ -0,0 +1,377 @@
+import asyncio
+import contextvars
+from collections import deque
+from datetime import timedelta
+from time import monotonic
+from types import TracebackType
+from typing import Any, Awaitable, Callable, Hashable, Literal, Self, TypedDict
+
+from oibot.cache import TTLCache
+from oibot.event import Context, Event
+from oibot.log import logger
+from oibot.matcher import fire_and_forget
+from oibot.plugin import group_openid, user_openid
+
+
+def conversation(event: Event) -> Hashable | None:
+    return group_openid(event) or user_openid(event)
+
+
+class Statistics(TypedDict):
+    depth: int
+    in_flight: int
+    submitted: int
+    completed: int
+    dropped: int
+    rejected: int
+    wait_time: float
+    max_wait_time: float
+
+
+class Dispatcher:
+    __slots__ = (
+        "workers",
+        "maxsize",
+        "overflow",
+        "drain_timeout",
+        "closed",
+        "queue",
+        "tasks",
+        "in_flight",
+        "submitted",
+        "completed",
+        "dropped",
+        "rejected",
+        "wait_time",
+        "max_wait_time",
+    )
+
+    def __init__(
+        self,
+        workers: int = 64,
+        maxsize: int = 1024,
+        *,
+        overflow: Literal["drop_oldest", "reject", "block"] = "reject",
+        drain_timeout: float | int | timedelta | None = 10,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("parameter `workers` must be positive")
+
+        if isinstance(drain_timeout, timedelta):
+            drain_timeout = drain_timeout.total_seconds()
+
+        self.workers = workers
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.drain_timeout = drain_timeout
+        self.closed = False
+
+        self.queue: asyncio.Queue[
+            tuple[
+                float,
+                Callable[[], Awaitable[Any]],
+                contextvars.Context,
+                Callable[[], Any] | None,
+            ]
+        ] = asyncio.Queue(maxsize)
+        self.tasks: list[asyncio.Task] = []
+
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    async def __aenter__(self) -> Self:
+        self.closed = False
+        self.tasks = [
+            asyncio.create_task(self.worker(), name=f"oibot-worker-{n}")
+            for n in range(self.workers)
+        ]
+
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None = None,
+        exc_value: BaseException | None = None,
+        traceback: TracebackType | None = None,
+    ) -> None:
+        if self.tasks and self.drain_timeout:
+            try:
+                async with asyncio.timeout(self.drain_timeout):
+                    await self.queue.join()
+
+            except TimeoutError:
+                logger.warning(
+                    "dispatcher closed with %d queued jobs", self.queue.qsize()
+                )
+
+        self.closed = True
+
+        for task in self.tasks:
+            task.cancel()
+
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+        self.tasks.clear()
+
+        self.discard()
+
+    def discard(self) -> None:
+        while not self.queue.empty():
+            _, _, _, callback = self.queue.get_nowait()
+            self.queue.task_done()
+
+            if callback is not None:
+                callback()
+
+            self.dropped += 1
+
+    async def submit(
+        self,
+        job: Callable[[], Awaitable[Any]],
+        *,
+        on_drop: Callable[[], Any] | None = None,
+        block: bool = False,
+        context: contextvars.Context | None = None,
+    ) -> bool:
+        if self.closed:
+            self.rejected += 1
+
+            return False
+
+        if context is None:
+            context = contextvars.copy_context()
+
+        item = (monotonic(), job, context, on_drop)
+
+        try:
+            self.queue.put_nowait(item)
+
+        except asyncio.QueueFull:
+            match "block" if block else self.overflow:
+                case "drop_oldest":
+                    _, dropped, _, callback = self.queue.get_nowait()
+                    self.queue.task_done()
+
+                    if callback is not None:
+                        callback()
+
+                    self.dropped += 1
+
+                    self.queue.put_nowait(item)
+
+                case "block":
+                    await self.queue.put(item)
+
+                    if self.closed:
+                        self.discard()
+
+                case _:
+                    self.rejected += 1
+
+                    return False
+
+        self.submitted += 1
+
+        return True
+
+    async def worker(self) -> None:
+        while True:
+            enqueued, job, context, _ = await self.queue.get()
+
+            self.wait_time += (wait := monotonic() - enqueued)
+            self.max_wait_time = max(self.max_wait_time, wait)
+
+            self.in_flight += 1
+
+            try:
+                await asyncio.create_task(job(), context=context)
+
+            except Exception as e:
+                logger.exception(e)
+
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+
+                self.queue.task_done()
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def statistics(self) -> Statistics:
+        return Statistics(
+            depth=self.queue.qsize(),
+            in_flight=self.in_flight,
+            submitted=self.submitted,
+            completed=self.completed,
+            dropped=self.dropped,
+            rejected=self.rejected,
+            wait_time=self.wait_time,
+            max_wait_time=self.max_wait_time,
+        )
+
+
+class Lanes:
+    class Slot:
+        __slots__ = ("lanes", "key", "job", "dispatcher", "on_drop", "context")
+
+        def __init__(
+            self,
+            lanes: "Lanes",
+            key: Hashable,
+            job: Callable[[], Awaitable[Any]],
+            dispatcher: Dispatcher | None,
+            on_drop: Callable[[], Any] | None,
+        ) -> None:
+            self.lanes = lanes
+            self.key = key
+            self.job = job
+            self.dispatcher = dispatcher
+            self.on_drop = on_drop
+            self.context = contextvars.copy_context()
+
+        async def __call__(self) -> Any:
+            try:
+                return await self.job()
+
+            finally:
+                self.lanes.advance(self.key)
+
+        async def dispatch(self, *, block: bool = False) -> bool:
+            if self.dispatcher is None:
+                fire_and_forget(self(), context=self.context)
+
+                return True
+
+            return await self.dispatcher.submit(
+                self, on_drop=self.drop, block=block, context=self.context
+            )
+
+        async def resume(self) -> None:
+            if not await self.dispatch(block=True):
+                self.drop()
+
+        def drop(self) -> None:
+            if self.on_drop is not None:
+                self.on_drop()
+
+            self.lanes.advance(self.key)
+
+    __slots__ = ("key", "maxsize", "lanes")
+
+    def __init__(
+        self,
+        key: (
+            Literal["user", "group", "conversation"]
+            | Callable[[Event], Hashable | None]
+        ) = "conversation",
+        maxsize: int = 64,
+    ) -> None:
+        match key:
+            case "user":
+                self.key = user_openid
+
+            case "group":
+                self.key = group_openid
+
+            case "conversation":
+                self.key = conversation
+
+            case _ if callable(key):
+                self.key = key
+
+            case _:
+                raise ValueError(f"invalid lane key {key!r}")
+
+        self.maxsize = maxsize
+        self.lanes: dict[Hashable, deque[Lanes.Slot]] = {}
+
+    def __len__(self) -> int:
+        return len(self.lanes)
+
+    async def submit(
+        self,
+        event: Event,
+        job: Callable[[], Awaitable[Any]],
+        dispatcher: Dispatcher | None = None,
+        *,
+        on_drop: Callable[[], Any] | None = None,
+    ) -> bool:
+        slot = self.Slot(self, self.key(event), job, dispatcher, on_drop)
+
+        if slot.key is None:
+            return await slot.dispatch()
+
+        if (pending := self.lanes.get(slot.key)) is not None:
+            if len(pending) >= self.maxsize:
+                return False
+
+            pending.append(slot)
+
+            return True
+
+        self.lanes[slot.key] = deque()
+
+        if await slot.dispatch():
+            return True
+
+        self.advance(slot.key)
+
+        return False
+
+    def advance(self, key: Hashable) -> None:
+        if key is None:
+            return
+
+        if not (pending := self.lanes.get(key)):
+            self.lanes.pop(key, None)
+
+            return
+
+        fire_and_forget(pending.popleft().resume())
+
+
+class Deduplicator:
+    __slots__ = ("seen", "duplicates")
+
+    def __init__(
+        self, ttl: float | int | timedelta = 300, maxsize: int = 65536
+    ) -> None:
+        self.seen = TTLCache(ttl, maxsize)
+
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self.seen)
+
+    @staticmethod
+    def keys(ctx: Context) -> list[str]:
+        return [
+            key
+            for key in (ctx.get("id"), (ctx.get("d") or {}).get("id"))
+            if key is not None
+        ]
+
+    def __call__(self, ctx: Context) -> bool:
+        keys = self.keys(ctx)
+
+        for key in keys:
+            if key in self.seen:
+                self.duplicates += 1
+
+                return True
+
+        for key in keys:
+            self.seen.set(key, None)
+
+        return False
+
+    def forget(self, ctx: Context) -> None:
+        for key in self.keys(ctx):
+            self.seen.pop(key)
@@ -1,6 +1,9 @@
 import logging
 from enum import IntEnum, StrEnum
-from typing import TYPE_CHECKING, Any, ClassVar, Literal, TypedDict
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, Literal, TypedDict, TypeVar
+
+from oibot.log import log_event
 
 if TYPE_CHECKING:
     from oibot.bot import OiBot
@@ -73,7 +76,33 @@ class Context(TypedDict):
     t: str
 
 
+E = TypeVar("E", bound="Event")
+
+
+def slotted(cls: type[E]) -> type[E]:
+    namespace = dict(cls.__dict__)
+
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+
+    decoders = {
+        name: attr.func
+        for name, attr in namespace.items()
+        if isinstance(attr, cached_property)
+    }
+
+    for name in decoders:
+        del namespace[name]
+
+    namespace["__slots__"] = tuple(decoders)
+    namespace["decoders"] = decoders
+
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
 class Event:
+    __slots__ = ("bot", "ctx", "__weakref__")
+
     d: dict[str, Any]
     id: str
     op: OP
@@ -84,6 +113,8 @@ class Event:
 
     event: ClassVar[dict[str, type["Event"]]] = {}
 
+    decoders: ClassVar[dict[str, Callable[["Event"], Any]]] = {}
+
     def __new__(cls, bot: "OiBot", ctx: Context) -> "Event":
         return (
             event.__new__(event, bot, ctx)
@@ -95,7 +126,7 @@ class Event:
         self.bot = bot
         self.ctx = ctx
 
-        logging.info(self)
+        log_event(self)
 
     def __init_subclass__(cls, *args, **kwargs) -> None:
         logging.debug(f"registered {cls} as type {cls.event_type}")
@@ -103,6 +134,11 @@ class Event:
         Event.event[cls.event_type] = cls
 
     def __getattr__(self, name: str) -> Any:
+        if (decoder := self.decoders.get(name)) is not None:
+            setattr(self, name, value := decoder(self))
+
+            return value
+
         try:
             return self.ctx["d"][name]
 
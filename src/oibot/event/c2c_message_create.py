@@ -5,11 +5,12 @@ from datetime import datetime
 from functools import cached_property
 from typing import ClassVar, Literal
 
-from oibot.api.send_message import Message, SendMessageResponse
-from oibot.event import Event
+from oibot.api.send_message import Message, SendMessageResponse, Template
+from oibot.event import Event, slotted
 from oibot.event.interaction_create import InteractionCreateEvent
 
 
+@slotted
 class C2CMessageCreateEvent(Event):
     @dataclass(frozen=True, slots=True)
     class Author:
@@ -82,7 +83,9 @@ class C2CMessageCreateEvent(Event):
     def timestamp(self) -> datetime:
         return datetime.fromtimestamp(self.ctx["d"]["timestamp"])
 
-    async def reply(self, message: str | Message, **kwargs) -> SendMessageResponse:
+    async def reply(
+        self, message: str | Message | Template, **kwargs
+    ) -> SendMessageResponse:
         kwargs.setdefault("msg_id", self.id)
         kwargs.setdefault("msg_seq", int(datetime.now().timestamp()))
 
@@ -94,7 +97,11 @@ class C2CMessageCreateEvent(Event):
         )
 
     async def defer(
-        self, message: str | Message, *, timeout: float | int | None = None, **kwargs
+        self,
+        message: str | Message | Template,
+        *,
+        timeout: float | int | None = None,
+        **kwargs
     ) -> "C2CMessageCreateEvent":
         async with self.bot.session_manager.defer(self.author.user_openid) as future:
             await self.reply(message=message, **kwargs)
@@ -3,10 +3,11 @@ from datetime import datetime
 from functools import cached_property
 from typing import ClassVar, Literal
 
-from oibot.api.send_message import Message, SendMessageResponse
-from oibot.event import Event
+from oibot.api.send_message import Message, SendMessageResponse, Template
+from oibot.event import Event, slotted
 
 
+@slotted
 class FriendAddEvent(Event):
     @dataclass(frozen=True, slots=True)
     class Author:
@@ -26,7 +27,9 @@ class FriendAddEvent(Event):
     def timestamp(self) -> datetime:
         return datetime.fromtimestamp(self.ctx["d"]["timestamp"])
 
-    async def reply(self, message: str | Message, **kwargs) -> SendMessageResponse:
+    async def reply(
+        self, message: str | Message | Template, **kwargs
+    ) -> SendMessageResponse:
         if isinstance(message, str):
             message = Message.content(content=message)
 
@@ -3,9 +3,10 @@ from datetime import datetime
 from functools import cached_property
 from typing import ClassVar, Literal
 
-from oibot.event import Event
+from oibot.event import Event, slotted
 
 
+@slotted
 class FriendDelEvent(Event):
     @dataclass(frozen=True, slots=True)
     class Author:
@@ -2,10 +2,11 @@ from datetime import datetime
 from functools import cached_property
 from typing import ClassVar, Literal
 
-from oibot.api.send_message import Message, SendMessageResponse
-from oibot.event import Event
+from oibot.api.send_message import Message, SendMessageResponse, Template
+from oibot.event import Event, slotted
 
 
+@slotted
 class GroupAddRobotEvent(Event):
     event_type: ClassVar[Literal["GROUP_ADD_ROBOT"]] = "GROUP_ADD_ROBOT"
 
@@ -17,7 +18,9 @@ class GroupAddRobotEvent(Event):
     def timestamp(self) -> datetime:
         return datetime.fromtimestamp(self.ctx["d"]["timestamp"])
 
-    async def reply(self, message: str | Message, **kwargs) -> SendMessageResponse:
+    async def reply(
+        self, message: str | Message | Template, **kwargs
+    ) -> SendMessageResponse:
         if isinstance(message, str):
             message = Message.content(content=message)
 
@@ -5,11 +5,12 @@ from datetime import datetime
 from functools import cached_property
 from typing import ClassVar, Literal
 
-from oibot.api.send_message import Message, SendMessageResponse
-from oibot.event import Event
+from oibot.api.send_message import Message, SendMessageResponse, Template
+from oibot.event import Event, slotted
 from oibot.event.interaction_create import InteractionCreateEvent
 
 
+@slotted
 class GroupAtMessageCreateEvent(Event):
     @dataclass(frozen=True, slots=True)
     class Author:
@@ -86,7 +87,9 @@ class GroupAtMessageCreateEvent(Event):
     def timestamp(self) -> datetime:
         return datetime.fromtimestamp(self.ctx["d"]["timestamp"])
 
-    async def reply(self, message: str | Message, **kwargs) -> SendMessageResponse:
+    async def reply(
+        self, message: str | Message | Template, **kwargs
+    ) -> SendMessageResponse:
         kwargs.setdefault("msg_id", self.id)
         kwargs.setdefault("msg_seq", int(datetime.now().timestamp()))
 
@@ -98,7 +101,11 @@ class GroupAtMessageCreateEvent(Event):
         )
 
     async def defer(
-        self, message: str | Message, *, timeout: float | int | None = None, **kwargs
+        self,
+        message: str | Message | Template,
+        *,
+        timeout: float | int | None = None,
+        **kwargs
     ) -> "GroupAtMessageCreateEvent":
         async with self.bot.session_manager.defer(self.author.member_openid) as future:
             await self.reply(message=message, **kwargs)
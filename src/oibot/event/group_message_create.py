@@ -8,11 +8,13 @@ from typing import ClassVar, Literal
 from oibot.api.send_message import (
     Message,
     SendMessageResponse,
+    Template,
 )
-from oibot.event import Event
+from oibot.event import Event, slotted
 from oibot.event.interaction_create import InteractionCreateEvent
 
 
+@slotted
 class GroupMessageCreateEvent(Event):
     @dataclass(frozen=True, slots=True)
     class Author:
@@ -94,7 +96,9 @@ class GroupMessageCreateEvent(Event):
     def timestamp(self) -> datetime:
         return datetime.fromtimestamp(self.ctx["d"]["timestamp"])
 
-    async def reply(self, message: str | Message, **kwargs) -> SendMessageResponse:
+    async def reply(
+        self, message: str | Message | Template, **kwargs
+    ) -> SendMessageResponse:
         kwargs.setdefault("msg_id", self.id)
         kwargs.setdefault("msg_seq", int(datetime.now().timestamp()))
 
@@ -106,7 +110,11 @@ class GroupMessageCreateEvent(Event):
         )
 
     async def defer(
-        self, message: str | Message, *, timeout: float | int | None = None, **kwargs
+        self,
+        message: str | Message | Template,
+        *,
+        timeout: float | int | None = None,
+        **kwargs
     ) -> "GroupMessageCreateEvent":
         async with self.bot.session_manager.defer(self.author.member_openid) as future:
             await self.reply(message=message, **kwargs)
@@ -2,9 +2,10 @@ from datetime import datetime
 from functools import cached_property
 from typing import ClassVar, Literal
 
-from oibot.event import Event
+from oibot.event import Event, slotted
 
 
+@slotted
 class GroupMsgReceiveEvent(Event):
     event_type: ClassVar[Literal["GROUP_MSG_RECEIVE"]] = "GROUP_MSG_RECEIVE"
 
@@ -6,10 +6,11 @@ from functools import cached_property
 from typing import Any, ClassVar, Literal
 
 from oibot.api.interaction import Code
-from oibot.api.send_message import Message, SendMessageResponse
-from oibot.event import Event
+from oibot.api.send_message import Message, SendMessageResponse, Template
+from oibot.event import Event, slotted
 
 
+@slotted
 class InteractionCreateEvent(Event):
     class Type(IntEnum):
         MESSAGE_BUTTON = 11
@@ -80,7 +81,9 @@ class InteractionCreateEvent(Event):
     async def interaction(self, code: Code) -> Any:
         return await self.bot.interaction(interaction_id=self.id, code=code)
 
-    async def reply(self, message: str | Message, **kwargs) -> SendMessageResponse:
+    async def reply(
+        self, message: str | Message | Template, **kwargs
+    ) -> SendMessageResponse:
         kwargs.setdefault("msg_id", self.id)
 
         if isinstance(message, str):
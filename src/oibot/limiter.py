@@ -0,0 +1,208 @@
+import asyncio
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from heapq import heappop, heappush
+from itertools import count
+from time import monotonic, time
+from typing import Hashable, Mapping
+
+
+def retry_after(headers: Mapping[str, str] | None, default: float) -> float:
+    if not headers or (value := headers.get("Retry-After")) is None:
+        return default
+
+    try:
+        return max(float(value), 0.0)
+
+    except ValueError:
+        pass
+
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time(), 0.0)
+
+    except (TypeError, ValueError):
+        return default
+
+
+class Limiter:
+    class Waiter:
+        __slots__ = (
+            "priority",
+            "sequence",
+            "limit",
+            "window",
+            "burst",
+            "tat",
+            "future",
+        )
+
+        def __init__(
+            self, priority: int, sequence: int, limit: int, window: float, burst: int
+        ) -> None:
+            self.priority = priority
+            self.sequence = sequence
+            self.limit = limit
+            self.window = window
+            self.burst = burst
+            self.tat: float | None = None
+            self.future: asyncio.Future[None] = (
+                asyncio.get_running_loop().create_future()
+            )
+
+        def __lt__(self, other: "Limiter.Waiter") -> bool:
+            return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+    __slots__ = ("tats", "interval", "swept", "waiters", "timers", "sequence")
+
+    def __init__(
+        self, interval: float | int | timedelta = timedelta(seconds=60)
+    ) -> None:
+        if isinstance(interval, timedelta):
+            interval = interval.total_seconds()
+
+        self.tats: dict[Hashable, float] = {}
+        self.interval = interval
+        self.swept = monotonic()
+
+        self.waiters: dict[Hashable, list[Limiter.Waiter]] = {}
+        self.timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self.sequence = count()
+
+    def __len__(self) -> int:
+        return len(self.tats.keys() | self.waiters.keys())
+
+    def sweep(self, now: float | None = None) -> None:
+        if now is None:
+            now = monotonic()
+
+        self.tats = {key: tat for key, tat in self.tats.items() if tat > now}
+        self.swept = now
+
+    @staticmethod
+    def emission(limit: int, window: float, burst: int) -> float:
+        return window / (limit - burst + 1)
+
+    def delay(
+        self, key: Hashable, limit: int, window: float, now: float, burst: int = 1
+    ) -> float:
+        return (
+            max(self.tats.get(key, now), now)
+            - (burst - 1) * self.emission(limit, window, burst)
+            - now
+        )
+
+    def reserve(
+        self, key: Hashable, limit: int, window: float, now: float, burst: int = 1
+    ) -> float:
+        delay = self.delay(key, limit, window, now, burst)
+
+        self.tats[key] = max(self.tats.get(key, now), now) + self.emission(
+            limit, window, burst
+        )
+
+        return delay
+
+    def wake(self, key: Hashable) -> None:
+        self.timers.pop(key, None)
+
+        waiters = self.waiters.get(key, [])
+
+        while waiters:
+            if (waiter := waiters[0]).future.done():
+                heappop(waiters)
+
+                continue
+
+            now = monotonic()
+
+            if (
+                delay := self.delay(key, waiter.limit, waiter.window, now, waiter.burst)
+            ) > 0:
+                self.timers[key] = asyncio.get_running_loop().call_later(
+                    delay, self.wake, key
+                )
+
+                return
+
+            heappop(waiters)
+
+            self.reserve(key, waiter.limit, waiter.window, now, waiter.burst)
+
+            waiter.tat = self.tats[key]
+            waiter.future.set_result(None)
+
+        self.waiters.pop(key, None)
+
+    async def acquire(
+        self,
+        key: Hashable,
+        limit: int,
+        window: float,
+        burst: int = 1,
+        timeout: float | None = None,
+        priority: int = 0,
+    ) -> None:
+        if (now := monotonic()) - self.swept >= self.interval:
+            self.sweep(now)
+
+        if (delay := self.delay(key, limit, window, now, burst)) <= 0 and (
+            key not in self.waiters
+        ):
+            self.reserve(key, limit, window, now, burst)
+
+            return
+
+        if timeout is not None and delay > timeout:
+            raise TimeoutError(f"rate limit delay exceeds deadline for {key!r}")
+
+        waiter = self.Waiter(priority, next(self.sequence), limit, window, burst)
+
+        heappush(self.waiters.setdefault(key, []), waiter)
+
+        if key not in self.timers:
+            self.wake(key)
+
+        try:
+            async with asyncio.timeout(timeout):
+                await waiter.future
+
+        except (asyncio.CancelledError, TimeoutError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.refund(key, waiter)
+
+            if isinstance(e, TimeoutError):
+                raise TimeoutError(
+                    f"rate limit delay exceeds deadline for {key!r}"
+                ) from None
+
+            raise
+
+    def refund(self, key: Hashable, waiter: "Limiter.Waiter") -> None:
+        # Only the latest reservation can be undone: once anyone has reserved
+        # after this grant, rolling the tat back would hand out their slot twice.
+        if self.tats.get(key) != waiter.tat:
+            return
+
+        self.tats[key] = waiter.tat - self.emission(
+            waiter.limit, waiter.window, waiter.burst
+        )
+
+        if (timer := self.timers.pop(key, None)) is not None:
+            timer.cancel()
+
+        self.wake(key)
+
+    def penalize(
+        self,
+        key: Hashable,
+        limit: int,
+        window: float,
+        retry_after: float,
+        burst: int = 1,
+    ) -> None:
+        now = monotonic()
+
+        self.tats[key] = max(
+            self.tats.get(key, now),
+            now + retry_after + (burst - 1) * self.emission(limit, window, burst),
+        )
@@ -0,0 +1,95 @@
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from oibot.event import Event
+
+logger = logging.getLogger("oibot")
+
+
+class Sampler:
+    __slots__ = ("intervals", "interval", "counters")
+
+    def __init__(
+        self, rates: dict[str, float] | None = None, default: float = 1.0
+    ) -> None:
+        self.intervals: dict[str, int] = {}
+        self.interval = 1
+        self.counters: dict[str, int] = {}
+
+        self.update(rates, default)
+
+    @staticmethod
+    def to_interval(rate: float) -> int:
+        if not 0 <= rate <= 1:
+            raise ValueError("sampling rate must be between 0 and 1")
+
+        return round(1 / rate) if rate else 0
+
+    def update(
+        self, rates: dict[str, float] | None = None, default: float = 1.0
+    ) -> None:
+        self.intervals = {
+            key: self.to_interval(rate) for key, rate in (rates or {}).items()
+        }
+        self.interval = self.to_interval(default)
+        self.counters.clear()
+
+    def __call__(self, key: str) -> bool:
+        if (interval := self.intervals.get(key, self.interval)) == 1:
+            return True
+
+        if not interval:
+            return False
+
+        self.counters[key] = count = self.counters.get(key, 0) + 1
+
+        return not count % interval
+
+
+class Handler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+sampler = Sampler()
+
+
+def log_event(event: "Event") -> None:
+    if logger.isEnabledFor(logging.INFO) and sampler(event_type := event.ctx.get("t")):
+        logger.info(
+            "%r",
+            event,
+            extra={"event_type": event_type, "event_id": event.ctx.get("id")},
+        )
+
+
+def configure(
+    *handlers: logging.Handler,
+    level: int | str | None = None,
+    rates: dict[str, float] | None = None,
+    default: float = 1.0,
+) -> QueueListener:
+    sampler.update(rates, default)
+
+    queue: SimpleQueue[logging.LogRecord] = SimpleQueue()
+
+    listener = QueueListener(
+        queue, *(handlers or (logging.StreamHandler(),)), respect_handler_level=True
+    )
+
+    for handler in logger.handlers[:]:
+        if isinstance(handler, Handler):
+            logger.removeHandler(handler)
+
+    logger.addHandler(Handler(queue))
+    logger.propagate = False
+
+    if level is not None:
+        logger.setLevel(level)
+
+    listener.start()
+
+    return listener
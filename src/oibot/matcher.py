@@ -1,8 +1,21 @@
 import asyncio
 from contextvars import Context
-from functools import partial, reduce, wraps
-from operator import and_, or_
-from typing import Any, Awaitable, Callable, Coroutine, Literal
+from datetime import timedelta
+from functools import lru_cache, partial, wraps
+from time import monotonic, perf_counter
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    ClassVar,
+    Coroutine,
+    Hashable,
+    Iterable,
+    Literal,
+)
+from weakref import WeakKeyDictionary
+
+from oibot.cache import TTLCache
 
 
 def ensure_async(
@@ -19,6 +32,7 @@ def ensure_async(
         @wraps(func)
         async def wrapper(*args, **kwargs) -> Any:
             return await asyncio.to_thread(func, *args, **kwargs)
+
     else:
 
         @wraps(func)
@@ -52,8 +66,202 @@ def fire_and_forget(
     return task
 
 
+class Router:
+    class Node:
+        __slots__ = ("children", "command")
+
+        def __init__(self) -> None:
+            self.children: dict[str, Router.Node] = {}
+            self.command: str | None = None
+
+    __slots__ = ("root", "route")
+
+    def __init__(self, maxsize: int | None = 1024) -> None:
+        self.root = self.Node()
+        self.route = lru_cache(maxsize=maxsize)(self.walk)
+
+    def add(self, command: str) -> None:
+        node = self.root
+
+        for char in command:
+            if (child := node.children.get(char)) is None:
+                node.children[char] = child = self.Node()
+
+            node = child
+
+        if node.command is None:
+            node.command = command
+
+            self.route.cache_clear()
+
+    def walk(self, content: str) -> tuple[str, str] | None:
+        content = content.lstrip()
+
+        node, route = self.root, None
+
+        for index, char in enumerate(content):
+            if node.command is not None and char.isspace():
+                route = (node.command, index)
+
+            if (node := node.children.get(char)) is None:
+                break
+
+        else:
+            if node.command is not None:
+                route = (node.command, len(content))
+
+        if route is None:
+            return None
+
+        command, index = route
+
+        return command, content[index:].strip()
+
+
+def merge(results: list[Any]) -> dict[str, Any]:
+    ctx = {}
+
+    for matched in results:
+        if matched:
+            ctx |= matched if isinstance(matched, dict) else {"_": matched}
+
+    return ctx
+
+
+class Statistics:
+    __slots__ = ("calls", "hits", "elapsed")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.hits = 0
+        self.elapsed = 0.0
+
+    def record(self, hit: bool, elapsed: float, window: int = 1024) -> None:
+        if self.calls >= window:
+            self.calls >>= 1
+            self.hits >>= 1
+            self.elapsed /= 2
+
+        self.calls += 1
+        self.hits += hit
+        self.elapsed += elapsed
+
+    def rank(self, operator: Literal["AND", "OR"]) -> float:
+        if not self.calls:
+            return 0.0
+
+        selectivity = self.hits / self.calls
+
+        return (self.elapsed / self.calls) / max(
+            1 - selectivity if operator == "AND" else selectivity, 1e-6
+        )
+
+
+class Schedule:
+    __slots__ = (
+        "matchers",
+        "operator",
+        "adaptive",
+        "interval",
+        "calls",
+        "statistics",
+        "sync_order",
+        "async_order",
+    )
+
+    def __init__(
+        self,
+        matchers: list["Matcher"],
+        operator: Literal["AND", "OR"],
+        *,
+        adaptive: bool = True,
+        interval: int = 64,
+    ) -> None:
+        self.matchers = matchers
+        self.operator = operator
+        self.adaptive = adaptive and (
+            operator == "AND" or all(matcher.pure for matcher in matchers)
+        )
+        self.interval = interval
+        self.calls = 0
+
+        self.statistics = [Statistics() for _ in matchers]
+
+        self.sync_order = [
+            index for index, matcher in enumerate(matchers) if not matcher.awaitable
+        ]
+        self.async_order = [
+            index for index, matcher in enumerate(matchers) if matcher.awaitable
+        ]
+
+    def next(self) -> None:
+        if not self.adaptive:
+            return
+
+        self.calls += 1
+
+        if self.calls >= self.interval:
+            self.calls = 0
+
+            def rank(index: int) -> float:
+                return self.statistics[index].rank(self.operator)
+
+            self.sync_order = sorted(self.sync_order, key=rank)
+            self.async_order = sorted(self.async_order, key=rank)
+
+    def call(self, index: int, *args, **kwargs) -> Any:
+        if not self.adaptive:
+            return self.matchers[index](*args, **kwargs)
+
+        start = perf_counter()
+
+        matched = self.matchers[index](*args, **kwargs)
+
+        self.statistics[index].record(bool(matched), perf_counter() - start)
+
+        return matched
+
+    async def acall(self, index: int, *args, **kwargs) -> Any:
+        if not self.adaptive:
+            return await self.matchers[index](*args, **kwargs)
+
+        start = perf_counter()
+
+        matched = await self.matchers[index](*args, **kwargs)
+
+        self.statistics[index].record(bool(matched), perf_counter() - start)
+
+        return matched
+
+    def first(self, *args, **kwargs) -> Any:
+        for index in self.sync_order:
+            if matched := self.call(index, *args, **kwargs):
+                return matched
+
+        return None
+
+    async def afirst(self, *args, **kwargs) -> Any:
+        for index in self.async_order:
+            if matched := await self.acall(index, *args, **kwargs):
+                return matched
+
+        return None
+
+
 class Matcher:
-    __slots__ = ("rule", "awaitable", "matchers", "operator")
+    __slots__ = (
+        "rule",
+        "awaitable",
+        "matchers",
+        "operator",
+        "adaptive",
+        "sequential",
+        "pure",
+    )
+
+    router: ClassVar[Router] = Router()
+
+    memo: ClassVar[WeakKeyDictionary[Any, dict[Hashable, Any]]] = WeakKeyDictionary()
 
     def __init__(
         self,
@@ -62,6 +270,9 @@ class Matcher:
         awaitable: bool = False,
         matchers: list["Matcher"] | None = None,
         operator: Literal["AND", "OR"] | None = None,
+        adaptive: bool = True,
+        sequential: bool = False,
+        pure: bool = False,
     ) -> None:
         self.rule = rule
 
@@ -73,88 +284,111 @@ class Matcher:
 
         self.matchers = matchers or []
         self.operator = operator
+        self.adaptive = adaptive
+        self.sequential = sequential
+        self.pure = pure
 
     def __call__(self, *args, **kwargs) -> Any:
         return self.rule(*args, **kwargs)
 
     def __and__(self, other: "Matcher") -> "Matcher":
-        matchers = [
-            *(self.matchers if self.operator == "AND" else [self]),
-            *(other.matchers if other.operator == "AND" else [other]),
-        ]
+        return self.all(self, other)
+
+    def __or__(self, other: "Matcher") -> "Matcher":
+        return self.any(self, other)
+
+    @classmethod
+    def combine(
+        cls,
+        matchers: list["Matcher"],
+        operator: Literal["AND", "OR"],
+        *,
+        adaptive: bool = True,
+        sequential: bool = False,
+    ) -> "Matcher":
+        schedule = Schedule(matchers, operator, adaptive=adaptive)
 
-        sync_matchers = [matcher for matcher in matchers if not matcher.awaitable]
+        awaitable = bool(schedule.async_order)
 
-        if async_matchers := [matcher for matcher in matchers if matcher.awaitable]:
+        if operator == "AND" and awaitable:
 
             async def wrapper(*args, **kwargs) -> dict[str, Any]:
-                ctx = {}
+                schedule.next()
+
+                results: list[Any] = [None] * len(matchers)
 
-                for matcher in sync_matchers:
-                    if not (matched := matcher(*args, **kwargs)):
+                for index in schedule.sync_order:
+                    if not (matched := schedule.call(index, *args, **kwargs)):
                         return {}
 
-                    ctx |= matched if isinstance(matched, dict) else {"_": matched}
+                    results[index] = matched
+
+                if sequential:
+                    for index in schedule.async_order:
+                        if not (
+                            matched := await schedule.acall(index, *args, **kwargs)
+                        ):
+                            return {}
+
+                        results[index] = matched
+
+                    return merge(results)
 
                 try:
                     async for completed_task in asyncio.as_completed(
-                        tasks := [
-                            asyncio.create_task(matcher(*args, **kwargs))
-                            for matcher in async_matchers
-                        ]
+                        tasks := {
+                            asyncio.create_task(
+                                schedule.acall(index, *args, **kwargs)
+                            ): index
+                            for index in schedule.async_order
+                        }
                     ):
                         if not (matched := await completed_task):
                             return {}
 
-                        ctx |= matched if isinstance(matched, dict) else {"_": matched}
+                        results[tasks[completed_task]] = matched
 
                 finally:
                     for task in tasks:
                         if not task.done():
                             task.cancel()
 
-                return ctx
+                return merge(results)
 
-        else:
+        elif operator == "AND":
 
             def wrapper(*args, **kwargs) -> dict[str, Any]:
-                ctx = {}
+                schedule.next()
 
-                for matcher in sync_matchers:
-                    if not (matched := matcher(*args, **kwargs)):
-                        return {}
+                results: list[Any] = [None] * len(matchers)
 
-                    ctx |= matched if isinstance(matched, dict) else {"_": matched}
+                for index in schedule.sync_order:
+                    if not (matched := schedule.call(index, *args, **kwargs)):
+                        return {}
 
-                return ctx
+                    results[index] = matched
 
-        return Matcher(
-            rule=wrapper,
-            awaitable=bool(async_matchers),
-            matchers=matchers,
-            operator="AND",
-        )
+                return merge(results)
 
-    def __or__(self, other: "Matcher") -> "Matcher":
-        matchers = [
-            *(self.matchers if self.operator == "OR" else [self]),
-            *(other.matchers if other.operator == "OR" else [other]),
-        ]
+        elif awaitable:
 
-        sync_matchers = [matcher for matcher in matchers if not matcher.awaitable]
+            async def wrapper(*args, **kwargs) -> dict[str, Any]:
+                schedule.next()
 
-        if async_matchers := [matcher for matcher in matchers if matcher.awaitable]:
+                if matched := schedule.first(*args, **kwargs):
+                    return matched if isinstance(matched, dict) else {"_": matched}
 
-            async def wrapper(*args, **kwargs) -> dict[str, Any]:
-                for matcher in sync_matchers:
-                    if matched := matcher(*args, **kwargs):
+                if sequential:
+                    if matched := await schedule.afirst(*args, **kwargs):
                         return matched if isinstance(matched, dict) else {"_": matched}
 
+                    return {}
+
                 try:
                     async for completed_task in asyncio.as_completed(
                         tasks := [
-                            asyncio.create_task(matcher(*args, **kwargs))
-                            for matcher in async_matchers
+                            asyncio.create_task(schedule.acall(index, *args, **kwargs))
+                            for index in schedule.async_order
                         ]
                     ):
                         if matched := await completed_task:
@@ -168,20 +402,25 @@ class Matcher:
                             task.cancel()
 
                 return {}
+
         else:
 
             def wrapper(*args, **kwargs) -> dict[str, Any]:
-                for matcher in sync_matchers:
-                    if matched := matcher(*args, **kwargs):
-                        return matched if isinstance(matched, dict) else {"_": matched}
+                schedule.next()
+
+                if matched := schedule.first(*args, **kwargs):
+                    return matched if isinstance(matched, dict) else {"_": matched}
 
                 return {}
 
-        return Matcher(
+        return cls(
             rule=wrapper,
-            awaitable=bool(async_matchers),
+            awaitable=awaitable,
             matchers=matchers,
-            operator="OR",
+            operator=operator,
+            adaptive=adaptive,
+            sequential=sequential,
+            pure=all(matcher.pure for matcher in matchers),
         )
 
     def __invert__(self) -> "Matcher":
@@ -195,7 +434,117 @@ class Matcher:
             async def wrapper(*args, **kwargs) -> bool:
                 return not await self(*args, **kwargs)
 
-        return Matcher(rule=wrapper, awaitable=self.awaitable)
+        return Matcher(rule=wrapper, awaitable=self.awaitable, pure=self.pure)
+
+    def memoize(self, key: Hashable | None = None) -> "Matcher":
+        key = self if key is None else key
+
+        memo = self.memo
+
+        def results(event: Any) -> dict[Hashable, Any] | None:
+            try:
+                if (results := memo.get(event)) is None:
+                    memo[event] = results = {}
+
+                return results
+
+            except TypeError:
+                return None
+
+        if not self.awaitable:
+
+            def wrapper(event: Any, *args, **kwargs) -> Any:
+                if (cache := results(event)) is None:
+                    return self(event, *args, **kwargs)
+
+                if key not in cache:
+                    cache[key] = self(event, *args, **kwargs)
+
+                return (
+                    dict(matched)
+                    if isinstance(matched := cache[key], dict)
+                    else matched
+                )
+
+        else:
+
+            async def wrapper(event: Any, *args, **kwargs) -> Any:
+                if (cache := results(event)) is None:
+                    return await self(event, *args, **kwargs)
+
+                if (task := cache.get(key)) is None:
+                    cache[key] = task = asyncio.ensure_future(
+                        self(event, *args, **kwargs)
+                    )
+
+                return (
+                    dict(matched)
+                    if isinstance(matched := await asyncio.shield(task), dict)
+                    else matched
+                )
+
+        return Matcher(rule=wrapper, awaitable=self.awaitable, pure=self.pure)
+
+    def cache(
+        self,
+        key: Callable[..., Hashable],
+        *,
+        ttl: float | int | timedelta = 60,
+        negative_ttl: float | int | timedelta | None = None,
+        maxsize: int = 1024,
+    ) -> "Matcher":
+        if isinstance(ttl, timedelta):
+            ttl = ttl.total_seconds()
+
+        if negative_ttl is None:
+            negative_ttl = ttl
+
+        elif isinstance(negative_ttl, timedelta):
+            negative_ttl = negative_ttl.total_seconds()
+
+        entries = TTLCache(ttl, maxsize)
+
+        if not self.awaitable:
+
+            def wrapper(*args, **kwargs) -> Any:
+                if entry := entries.lookup(k := key(*args, **kwargs), monotonic()):
+                    matched = entry.value
+
+                else:
+                    entries.set(k, matched := self(*args, **kwargs))
+                    entries.expire(k, ttl if matched else negative_ttl)
+
+                return dict(matched) if isinstance(matched, dict) else matched
+
+        else:
+
+            def settle(k: Hashable, task: asyncio.Task) -> None:
+                if entries.peek(k) is not task:
+                    return
+
+                if task.cancelled() or task.exception() is not None:
+                    entries.pop(k)
+
+                else:
+                    entries.expire(k, ttl if task.result() else negative_ttl)
+
+            async def wrapper(*args, **kwargs) -> Any:
+                if entry := entries.lookup(k := key(*args, **kwargs), monotonic()):
+                    task = entry.value
+
+                else:
+                    entries.set(k, task := asyncio.ensure_future(self(*args, **kwargs)))
+                    entries.expire(k, None)
+
+                    task.add_done_callback(partial(settle, k))
+
+                return (
+                    dict(matched)
+                    if isinstance(matched := await asyncio.shield(task), dict)
+                    else matched
+                )
+
+        return Matcher(rule=wrapper, awaitable=self.awaitable, pure=self.pure)
 
     async def match(self, *args, **kwargs) -> dict[str, Any]:
         if matched := (
@@ -206,9 +555,86 @@ class Matcher:
         return {}
 
     @classmethod
-    def all(cls, *matchers: "Matcher") -> "Matcher":
-        return reduce(and_, matchers)
+    def command(cls, *commands: str, params: Iterable[str] = ()) -> "Matcher":
+        router = cls.router
+
+        for command in commands:
+            router.add(command)
+
+        commands = frozenset(commands)
+        params = tuple(params)
+
+        def rule(event: Any, *args, **kwargs) -> dict[str, Any]:
+            if not (
+                isinstance(content := getattr(event, "content", None), str)
+                and (route := router.route(content))
+                and route[0] in commands
+            ):
+                return {}
+
+            command, argument = route
+
+            args = argument.split()
+
+            return {"command": command, "args": args, **dict(zip(params, args))}
+
+        return cls(rule)
+
+    @classmethod
+    def flatten(
+        cls,
+        matchers: Iterable["Matcher"],
+        operator: Literal["AND", "OR"],
+        *,
+        adaptive: bool | None = None,
+        sequential: bool | None = None,
+    ) -> "Matcher":
+        children: list[Matcher] = []
+        flattened: list[Matcher] = []
+
+        for matcher in matchers:
+            if matcher.operator == operator:
+                children.extend(matcher.matchers)
+                flattened.append(matcher)
+
+            else:
+                children.append(matcher)
+
+        return cls.combine(
+            children,
+            operator,
+            adaptive=(
+                all(matcher.adaptive for matcher in flattened)
+                if adaptive is None
+                else adaptive
+            ),
+            sequential=(
+                any(matcher.sequential for matcher in flattened)
+                if sequential is None
+                else sequential
+            ),
+        )
+
+    @classmethod
+    def all(
+        cls,
+        *matchers: "Matcher",
+        adaptive: bool | None = None,
+        sequential: bool | None = None,
+    ) -> "Matcher":
+        if len(matchers) == 1:
+            return matchers[0]
+
+        return cls.flatten(matchers, "AND", adaptive=adaptive, sequential=sequential)
 
     @classmethod
-    def any(cls, *matchers: "Matcher") -> "Matcher":
-        return reduce(or_, matchers)
+    def any(
+        cls,
+        *matchers: "Matcher",
+        adaptive: bool | None = None,
+        sequential: bool | None = None,
+    ) -> "Matcher":
+        if len(matchers) == 1:
+            return matchers[0]
+
+        return cls.flatten(matchers, "OR", adaptive=adaptive, sequential=sequential)
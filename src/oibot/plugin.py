@@ -9,10 +9,12 @@ from contextlib import (
     asynccontextmanager,
     contextmanager,
 )
+from datetime import timedelta
 from functools import partial, wraps
 from importlib import import_module, reload
 from inspect import (
     Parameter,
+    Signature,
     isasyncgenfunction,
     isclass,
     iscoroutinefunction,
@@ -20,23 +22,158 @@ from inspect import (
     signature,
 )
 from types import ModuleType, UnionType
-from typing import Any, AsyncIterator, Awaitable, Callable, Union, get_args, get_origin
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    ClassVar,
+    Hashable,
+    Literal,
+    Union,
+    get_args,
+    get_origin,
+)
+from weakref import WeakSet
 
+from oibot.cache import TTLCache
 from oibot.event import Event
-from oibot.matcher import Matcher
+from oibot.matcher import Matcher, fire_and_forget
 
+Scope = Literal["event", "user", "group", "app"] | Callable[[Event], Hashable]
 
-class Dependency:
-    __slots__ = ("dependency", "signature")
 
-    def __init__(self, dependency: Callable[..., Any]) -> None:
+def user_openid(event: Event) -> str | None:
+    match event.event_type:
+        case "C2C_MESSAGE_CREATE":
+            return event.author.user_openid
+
+        case "GROUP_AT_MESSAGE_CREATE" | "GROUP_MESSAGE_CREATE":
+            return event.author.member_openid
+
+        case "INTERACTION_CREATE":
+            return getattr(event, "group_member_openid", None) or getattr(
+                event, "user_openid", None
+            )
+
+    return getattr(event, "openid", None)
+
+
+def group_openid(event: Event) -> str | None:
+    return getattr(event, "group_openid", None)
+
+
+class Cache:
+    class Entry:
+        __slots__ = ("future", "stack")
+
+        def __init__(self) -> None:
+            self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+            self.stack = AsyncExitStack()
+
+    __slots__ = ("entries", "__weakref__")
+
+    instances: ClassVar[WeakSet["Cache"]] = WeakSet()
+
+    def __init__(
+        self,
+        *,
+        ttl: float | int | timedelta | None = None,
+        maxsize: int | None = None,
+    ) -> None:
+        self.entries = TTLCache(
+            ttl,
+            maxsize,
+            evictable=lambda entry: entry.future.done(),
+            on_evict=lambda _, entry: fire_and_forget(entry.stack.aclose()),
+        )
+
+        self.instances.add(self)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> "Cache.Entry | None":
+        return self.entries.get(key)
+
+    def create(self, key: Hashable) -> "Cache.Entry":
+        self.evict(key)
+
+        self.entries.set(key, entry := self.Entry())
+
+        return entry
+
+    def evict(self, key: Hashable) -> None:
+        self.entries.evict(key)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    async def aclose(self) -> None:
+        if pending := [
+            entry.future for entry in self.entries.values() if not entry.future.done()
+        ]:
+            await asyncio.wait(pending)
+
+        for key in self.entries:
+            await self.entries.pop(key).stack.aclose()
+
+    @classmethod
+    async def aclose_all(cls) -> None:
+        for cache in list(cls.instances):
+            await cache.aclose()
+
+
+class Dependency:
+    __slots__ = ("dependency", "signature", "scope", "cache")
+
+    def __init__(
+        self,
+        dependency: Callable[..., Any],
+        *,
+        scope: Scope = "event",
+        ttl: float | int | timedelta | None = None,
+        maxsize: int | None = 1024,
+    ) -> None:
         self.dependency = dependency
         self.signature = signature(dependency)
 
+        match scope:
+            case "event":
+                self.scope = None
+
+            case "user":
+                self.scope = user_openid
+
+            case "group":
+                self.scope = group_openid
+
+            case "app":
+                self.scope = lambda _: "app"
+
+            case _ if callable(scope):
+                self.scope = scope
+
+            case _:
+                raise ValueError(f"invalid dependency scope {scope!r}")
+
+        self.cache = None if self.scope is None else Cache(ttl=ttl, maxsize=maxsize)
+
     @classmethod
-    def from_provider(cls, dependency: Callable[..., Any], *args, **kwargs) -> Any:
+    def from_provider(
+        cls,
+        dependency: Callable[..., Any],
+        *args,
+        scope: Scope = "event",
+        ttl: float | int | timedelta | None = None,
+        maxsize: int | None = 1024,
+        **kwargs,
+    ) -> Any:
         return cls(
-            partial(dependency, *args, **kwargs) if args or kwargs else dependency
+            partial(dependency, *args, **kwargs) if args or kwargs else dependency,
+            scope=scope,
+            ttl=ttl,
+            maxsize=maxsize,
         )
 
 
@@ -84,10 +221,15 @@ class SessionManager:
 
 class Plugin:
     class Executor:
-        __slots__ = ("func",)
+        __slots__ = ("func", "event_type")
 
-        def __init__(self, func: Callable[..., Any]) -> None:
+        def __init__(
+            self,
+            func: Callable[..., Any],
+            event_type: tuple[type[Event], ...] = (Event,),
+        ) -> None:
             self.func = func
+            self.event_type = event_type
 
         async def __call__(self, event: Event) -> Any:
             return await self.func(event)
@@ -111,24 +253,47 @@ class Plugin:
     async def __call__(self, event: Event) -> None:
         async with asyncio.TaskGroup() as tg:
             for executor in self.executors:
-                tg.create_task(executor(event))
+                if isinstance(event, executor.event_type):
+                    tg.create_task(executor(event))
 
 
 class PluginManager:
-    __slots__ = ("plugins",)
+    __slots__ = ("plugins", "executors")
 
     def __init__(self) -> None:
         self.plugins: dict[str, Plugin] = {}
+        self.executors: dict[
+            tuple[type[Event], frozenset[str] | None], list[Plugin.Executor]
+        ] = {}
+
+    async def __call__(
+        self, event: Event, plugins: frozenset[str] | None = None
+    ) -> None:
+        if not (executors := self.dispatch(type(event), plugins)):
+            return
 
-    async def __call__(self, event: Event) -> None:
         try:
             async with asyncio.TaskGroup() as tg:
-                for plugin in self.plugins.values():
-                    tg.create_task(plugin(event))
+                for executor in executors:
+                    tg.create_task(executor(event))
 
         except* Exception as e:
             logging.exception(e)
 
+    def dispatch(
+        self, event_type: type[Event], plugins: frozenset[str] | None = None
+    ) -> list[Plugin.Executor]:
+        if (executors := self.executors.get(key := (event_type, plugins))) is None:
+            self.executors[key] = executors = [
+                executor
+                for name, plugin in self.plugins.items()
+                if plugins is None or name in plugins
+                for executor in plugin.executors
+                if issubclass(event_type, executor.event_type)
+            ]
+
+        return executors
+
     def import_from(self, plugins: str) -> None:
         def load_module(module_path: str) -> None:
             module_name = (
@@ -175,107 +340,333 @@ class PluginManager:
         ):
             load_module(plugins)
 
+        self.executors.clear()
 
-def on(
-    matchers: Matcher | Callable[..., bool | Awaitable[bool]] | None = None,
-) -> Callable[..., Any]:
-    def annotation_event_type(annotation: Any) -> tuple[type[Event], ...]:
-        if get_origin(annotation) in (Union, UnionType):
-            return tuple(
-                event
-                for arg in get_args(annotation)
-                for event in annotation_event_type(arg)
+
+def annotation_event_type(annotation: Any) -> tuple[type[Event], ...]:
+    if get_origin(annotation) in (Union, UnionType):
+        return tuple(
+            event
+            for arg in get_args(annotation)
+            for event in annotation_event_type(arg)
+        )
+
+    elif isclass(annotation) and issubclass(annotation, Event):
+        return (annotation,)
+
+    else:
+        return ()
+
+
+class Plan:
+    class Step:
+        __slots__ = (
+            "func",
+            "name",
+            "scope",
+            "cache",
+            "factory",
+            "context",
+            "awaitable",
+            "deferred",
+            "defaults",
+            "events",
+            "dependencies",
+            "matched",
+            "var_keyword",
+        )
+
+        def __init__(
+            self,
+            func: Callable[..., Any],
+            sign: Signature,
+            visit: Callable[[Dependency], int],
+            *,
+            handler: bool = False,
+            scope: Callable[[Event], Hashable] | None = None,
+            cache: Cache | None = None,
+        ) -> None:
+            self.func = func
+            self.scope = scope
+            self.cache = cache
+
+            f = func
+
+            while isinstance(f, partial):
+                f = f.func
+
+            self.name = getattr(f, "__name__", repr(f))
+
+            self.factory = func
+            self.context: Literal["sync", "async"] | None = None
+            self.awaitable = False
+
+            if isclass(f) and issubclass(f, AbstractAsyncContextManager):
+                self.context = "async"
+
+            elif isclass(f) and issubclass(f, AbstractContextManager):
+                self.context = "sync"
+
+            elif isasyncgenfunction(f):
+                self.factory = asynccontextmanager(func)
+                self.context = "async"
+
+            elif isgeneratorfunction(f):
+                self.factory = contextmanager(func)
+                self.context = "sync"
+
+            elif iscoroutinefunction(f):
+                self.awaitable = True
+
+            self.defaults: dict[str, Any] = {}
+            self.events: list[tuple[str, tuple[type[Event], ...]]] = []
+            self.dependencies: list[tuple[str, int]] = []
+            self.matched: list[str] = []
+            self.var_keyword = False
+
+            for param_name, param in sign.parameters.items():
+                if isinstance(param.default, Dependency):
+                    self.dependencies.append((param_name, visit(param.default)))
+
+                elif event_type := annotation_event_type(param.annotation):
+                    self.events.append((param_name, event_type))
+
+                    if param.default is not Parameter.empty:
+                        self.defaults[param_name] = param.default
+
+                elif param.default is not Parameter.empty:
+                    self.defaults[param_name] = param.default
+
+                elif param.kind is Parameter.VAR_POSITIONAL:
+                    pass
+
+                elif param.kind is Parameter.VAR_KEYWORD:
+                    self.var_keyword = handler
+
+                elif handler:
+                    self.matched.append(param_name)
+
+                else:
+                    raise self.unresolved(param_name)
+
+            self.awaitable = (
+                self.awaitable or self.context == "async" or cache is not None
             )
+            self.deferred = self.awaitable
 
-        elif isclass(annotation) and issubclass(annotation, Event):
-            return (annotation,)
+        def unresolved(self, param_name: str) -> ValueError:
+            return ValueError(
+                f"cannot resolve dependency for parameter '{param_name}' "
+                f"in function '{self.name}'. "
+                f"parameter must have either a default value, be an Event, or be a Dependency."
+            )
 
-        else:
-            return ()
+        def arguments(
+            self, event: Event, values: list[Any], matched: dict[str, Any]
+        ) -> dict[str, Any]:
+            kwargs = self.defaults.copy()
 
-    async def resolve_dependency(
-        event: Event,
-        dependency: Dependency,
-        dependency_cache: dict[Callable[..., Any], asyncio.Future],
-        stack: AsyncExitStack,
-    ) -> Any:
-        func = dependency.dependency
+            for param_name, event_type in self.events:
+                if isinstance(event, event_type):
+                    kwargs[param_name] = event
 
-        kwargs: dict[str, Any] = {}
-        tasks: dict[str, asyncio.Task] = {}
+                elif param_name in kwargs:
+                    pass
 
-        if future := dependency_cache.get(dependency.dependency):
-            return await future
+                elif param_name in matched:
+                    kwargs[param_name] = matched.pop(param_name)
 
-        dependency_cache[dependency.dependency] = future = (
-            asyncio.get_running_loop().create_future()
-        )
+                else:
+                    raise self.unresolved(param_name)
 
-        try:
-            async with asyncio.TaskGroup() as tg:
-                for param_name, param in dependency.signature.parameters.items():
-                    if isinstance(param.default, Dependency):
-                        tasks[param_name] = tg.create_task(
-                            resolve_dependency(
-                                event, param.default, dependency_cache, stack
-                            )
-                        )
+            for param_name, index in self.dependencies:
+                kwargs[param_name] = values[index]
 
-                    elif isinstance(event, annotation_event_type(param.annotation)):
-                        kwargs[param_name] = event
+            for param_name in self.matched:
+                if param_name not in matched:
+                    raise self.unresolved(param_name)
 
-                    elif param.default is not Parameter.empty:
-                        kwargs[param_name] = param.default
+                kwargs[param_name] = matched.pop(param_name)
 
-                    elif param.kind in (
-                        Parameter.VAR_POSITIONAL,
-                        Parameter.VAR_KEYWORD,
-                    ):
-                        pass
+            if self.var_keyword:
+                kwargs |= matched
 
-                    else:
-                        raise ValueError(
-                            f"cannot resolve dependency for parameter '{param_name}' "
-                            f"in function '{func.__name__}'. "
-                            f"parameter must have either a default value, be an Event, or be a Dependency"
-                        )
+            return kwargs
 
-            kwargs |= {k: v.result() for k, v in tasks.items()}
+        def resolve(
+            self,
+            event: Event,
+            values: list[Any],
+            matched: dict[str, Any],
+            stack: AsyncExitStack | None,
+        ) -> Any:
+            result = self.factory(**self.arguments(event, values, matched))
 
-            f = func
+            if self.context == "sync":
+                return stack.enter_context(result)
 
-            while isinstance(f, partial):
-                f = f.func
+            return result
 
-            if isclass(f) and issubclass(f, AbstractAsyncContextManager):
-                result = await stack.enter_async_context(func(**kwargs))
+        async def aresolve(
+            self,
+            event: Event,
+            values: list[Any],
+            matched: dict[str, Any],
+            stack: AsyncExitStack | None,
+        ) -> Any:
+            if self.cache is None or (key := self.scope(event)) is None:
+                return await self.call(event, values, matched, stack)
 
-            elif isclass(f) and issubclass(f, AbstractContextManager):
-                result = stack.enter_context(func(**kwargs))
+            if entry := self.cache.get(key):
+                return await asyncio.shield(entry.future)
 
-            elif isasyncgenfunction(f):
-                result = await stack.enter_async_context(
-                    asynccontextmanager(func)(**kwargs)
-                )
+            entry = self.cache.create(key)
 
-            elif isgeneratorfunction(f):
-                result = stack.enter_context(contextmanager(func)(**kwargs))
+            try:
+                result = await self.call(event, values, matched, entry.stack)
 
-            elif iscoroutinefunction(f):
-                result = await func(**kwargs)
+                entry.future.set_result(result)
 
-            else:
-                result = func(**kwargs)
+                return result
 
-            future.set_result(result)
+            except BaseException as e:
+                entry.future.set_exception(e)
+
+                if self.cache.entries.peek(key) is entry:
+                    self.cache.evict(key)
+
+                entry.future.exception()
+
+                raise
+
+        async def call(
+            self,
+            event: Event,
+            values: list[Any],
+            matched: dict[str, Any],
+            stack: AsyncExitStack | None,
+        ) -> Any:
+            result = self.factory(**self.arguments(event, values, matched))
+
+            if self.context == "async":
+                return await stack.enter_async_context(result)
+
+            elif self.context == "sync":
+                return stack.enter_context(result)
+
+            elif self.awaitable:
+                return await result
 
             return result
 
-        except BaseException as e:
-            future.set_exception(e)
+    __slots__ = ("steps", "concurrent", "contextual")
+
+    def __init__(self, func: Callable[..., Any]) -> None:
+        self.steps: list[Plan.Step] = []
+
+        indices: dict[Callable[..., Any], int] = {}
+        visiting: set[Callable[..., Any]] = set()
+
+        def visit(dependency: Dependency) -> int:
+            if (index := indices.get(key := dependency.dependency)) is not None:
+                return index
+
+            if key in visiting:
+                raise ValueError(
+                    f"circular dependency detected while resolving {key!r}"
+                )
+
+            visiting.add(key)
+
+            step = self.Step(
+                key,
+                dependency.signature,
+                visit,
+                scope=dependency.scope,
+                cache=dependency.cache,
+            )
+
+            visiting.discard(key)
+
+            indices[key] = index = len(self.steps)
+
+            self.steps.append(step)
+
+            return index
+
+        self.steps.append(self.Step(func, signature(func), visit, handler=True))
 
-            raise
+        ancestors: list[set[int]] = []
 
+        for step in self.steps:
+            ancestors.append(
+                {index for _, index in step.dependencies}.union(
+                    *(ancestors[index] for _, index in step.dependencies)
+                )
+            )
+
+            step.deferred = step.awaitable or any(
+                self.steps[index].deferred for _, index in step.dependencies
+            )
+
+        deferred = [
+            index for index, step in enumerate(self.steps[:-1]) if step.deferred
+        ]
+
+        self.concurrent = any(
+            i not in ancestors[j] and j not in ancestors[i]
+            for n, i in enumerate(deferred)
+            for j in deferred[n + 1 :]
+        )
+
+        self.contextual = any(step.context for step in self.steps)
+
+    async def __call__(self, event: Event, matched: dict[str, Any]) -> Any:
+        if self.contextual:
+            async with AsyncExitStack() as stack:
+                return await self.execute(event, matched, stack)
+
+        return await self.execute(event, matched, None)
+
+    async def execute(
+        self, event: Event, matched: dict[str, Any], stack: AsyncExitStack | None
+    ) -> Any:
+        *steps, handler = self.steps
+
+        values: list[Any] = [None] * len(self.steps)
+
+        if self.concurrent:
+            tasks: dict[int, asyncio.Task] = {}
+
+            async def resolve(index: int, step: Plan.Step) -> None:
+                for _, dependency in step.dependencies:
+                    if task := tasks.get(dependency):
+                        await task
+
+                values[index] = await step.aresolve(event, values, {}, stack)
+
+            async with asyncio.TaskGroup() as tg:
+                for index, step in enumerate(steps):
+                    if step.deferred:
+                        tasks[index] = tg.create_task(resolve(index, step))
+
+                    else:
+                        values[index] = step.resolve(event, values, {}, stack)
+
+        else:
+            for index, step in enumerate(steps):
+                values[index] = (
+                    await step.aresolve(event, values, {}, stack)
+                    if step.deferred
+                    else step.resolve(event, values, {}, stack)
+                )
+
+        return await handler.aresolve(event, values, matched, stack)
+
+
+def on(
+    matchers: Matcher | Callable[..., bool | Awaitable[bool]] | None = None,
+) -> Callable[..., Any]:
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
         sign = signature(func)
 
@@ -294,57 +685,14 @@ def on(
         if any(
             isinstance(param.default, Dependency) for param in sign.parameters.values()
         ):
+            plan = Plan(func)
 
             @wraps(func)
             async def wrapper(event: Event) -> Any:
                 if isinstance(event, event_type) and (
                     matched := await matcher.match(event)
                 ):
-                    dependency_cache: dict[Callable[..., Any], asyncio.Future] = {}
-
-                    kwargs: dict[str, Any] = {}
-                    tasks: dict[str, asyncio.Task] = {}
-
-                    async with AsyncExitStack() as stack:
-                        async with asyncio.TaskGroup() as tg:
-                            for param_name, param in sign.parameters.items():
-                                if isinstance(param.default, Dependency):
-                                    tasks[param_name] = tg.create_task(
-                                        resolve_dependency(
-                                            event,
-                                            param.default,
-                                            dependency_cache,
-                                            stack,
-                                        )
-                                    )
-
-                                elif isinstance(
-                                    event, annotation_event_type(param.annotation)
-                                ):
-                                    kwargs[param_name] = event
-
-                                elif param.default is not Parameter.empty:
-                                    kwargs[param_name] = param.default
-
-                                elif param_name in matched:
-                                    kwargs[param_name] = matched.pop(param_name)
-
-                                elif param.kind is Parameter.VAR_POSITIONAL:
-                                    pass
-
-                                elif param.kind is Parameter.VAR_KEYWORD:
-                                    kwargs |= matched
-
-                                else:
-                                    raise ValueError(
-                                        f"cannot resolve dependency for parameter '{param_name}' "
-                                        f"in function '{func.__name__}'. "
-                                        f"parameter must have either a default value, be an Event, or be a Dependency."
-                                    )
-
-                        kwargs |= {k: v.result() for k, v in tasks.items()}
-
-                        return await func(**kwargs)
+                    return await plan(event, matched)
 
         else:
             if not (
@@ -378,6 +726,6 @@ def on(
                             },
                         )
 
-        return Plugin.Executor(wrapper)
+        return Plugin.Executor(wrapper, event_type)
 
     return decorator
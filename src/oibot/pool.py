@@ -0,0 +1,58 @@
+import asyncio
+from datetime import timedelta
+
+from aiohttp import ClientSession, TCPConnector
+
+from oibot.log import logger
+
+
+class Pool:
+    __slots__ = ("limit", "limit_per_host", "keepalive", "dns_ttl", "warm")
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        *,
+        keepalive: float | int | timedelta = 30,
+        dns_ttl: int | timedelta | None = 300,
+        warm: int = 4,
+    ) -> None:
+        if isinstance(keepalive, timedelta):
+            keepalive = keepalive.total_seconds()
+
+        if isinstance(dns_ttl, timedelta):
+            dns_ttl = int(dns_ttl.total_seconds())
+
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive = keepalive
+        self.dns_ttl = dns_ttl
+        self.warm = warm
+
+    def session(self, base_url: str | None = None, **kwargs) -> ClientSession:
+        return ClientSession(
+            base_url=base_url,
+            connector=TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive,
+                use_dns_cache=self.dns_ttl is not None,
+                ttl_dns_cache=self.dns_ttl,
+            ),
+            raise_for_status=True,
+            **kwargs,
+        )
+
+    async def warmup(self, session: ClientSession, url: str) -> None:
+        async def connect() -> None:
+            async with session.get(url, raise_for_status=False) as resp:
+                await resp.read()
+
+        results = await asyncio.gather(
+            *(connect() for _ in range(self.warm)), return_exceptions=True
+        )
+
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("failed to pre-warm connection to %s: %r", url, result)
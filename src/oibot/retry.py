@@ -0,0 +1,210 @@
+import asyncio
+import random
+import re
+from contextvars import ContextVar
+from datetime import timedelta
+from http import HTTPMethod, HTTPStatus
+from time import monotonic
+from typing import Any, Awaitable, Callable, Mapping
+
+from aiohttp import ClientConnectionError, ClientResponseError
+from yarl import URL
+
+from oibot.limiter import retry_after
+from oibot.log import logger
+
+throttled: ContextVar[Callable[[ClientResponseError], Awaitable[None]] | None] = (
+    ContextVar("throttled", default=None)
+)
+
+
+class CircuitOpenError(ConnectionError):
+    pass
+
+
+class Breaker:
+    __slots__ = ("threshold", "cooldown", "failures", "opened", "probing")
+
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self.failures = 0
+        self.opened: float | None = None
+        self.probing = False
+
+    @property
+    def closed(self) -> bool:
+        return self.opened is None
+
+    def allow(self) -> bool:
+        if self.opened is None:
+            return True
+
+        if self.probing or monotonic() - self.opened < self.cooldown:
+            return False
+
+        self.probing = True
+
+        return True
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened = None
+        self.probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+
+        if self.probing or self.failures >= self.threshold:
+            self.opened = monotonic()
+
+        self.probing = False
+
+
+class Retry:
+    RETRYABLE = frozenset(
+        {
+            HTTPStatus.TOO_MANY_REQUESTS,
+            HTTPStatus.INTERNAL_SERVER_ERROR,
+            HTTPStatus.BAD_GATEWAY,
+            HTTPStatus.SERVICE_UNAVAILABLE,
+            HTTPStatus.GATEWAY_TIMEOUT,
+        }
+    )
+
+    __slots__ = (
+        "attempts",
+        "backoff",
+        "max_backoff",
+        "threshold",
+        "cooldown",
+        "breakers",
+    )
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        *,
+        backoff: float | int | timedelta = 0.5,
+        max_backoff: float | int | timedelta = 30,
+        threshold: int = 5,
+        cooldown: float | int | timedelta = 30,
+    ) -> None:
+        if attempts < 1:
+            raise ValueError("parameter `attempts` must be positive")
+
+        if isinstance(backoff, timedelta):
+            backoff = backoff.total_seconds()
+
+        if isinstance(max_backoff, timedelta):
+            max_backoff = max_backoff.total_seconds()
+
+        if isinstance(cooldown, timedelta):
+            cooldown = cooldown.total_seconds()
+
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self.breakers: dict[str, Breaker] = {}
+
+    @staticmethod
+    def endpoint(method: HTTPMethod | str, url: str) -> str:
+        return f"{method} {(url := URL(url)).host or ''}" + re.sub(
+            r"/(?!(?:[A-Za-z_]+|v\d+)(?:/|$))[^/]+", "/{}", url.path
+        )
+
+    @staticmethod
+    def idempotent(method: HTTPMethod | str, url: str, body: Mapping[str, Any]) -> bool:
+        if method != HTTPMethod.POST:
+            return True
+
+        return not (
+            body.get("srv_send_msg")
+            or (URL(url).path.endswith("/messages") and "msg_seq" not in body)
+        )
+
+    def breaker(self, endpoint: str) -> Breaker:
+        if (breaker := self.breakers.get(endpoint)) is None:
+            self.breakers[endpoint] = breaker = Breaker(self.threshold, self.cooldown)
+
+        return breaker
+
+    @classmethod
+    def retryable(cls, e: BaseException) -> bool:
+        if isinstance(e, ClientResponseError):
+            return e.status in cls.RETRYABLE
+
+        return isinstance(e, (ClientConnectionError, asyncio.TimeoutError))
+
+    def delay(self, attempt: int, e: BaseException) -> float:
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+        if isinstance(e, ClientResponseError):
+            delay = max(delay, retry_after(e.headers, 0.0))
+
+        return delay
+
+    async def __call__(
+        self,
+        method: HTTPMethod | str,
+        url: str,
+        request: Callable[[], Awaitable[Any]],
+        *,
+        attempts: int | None = None,
+    ) -> Any:
+        if attempts is None:
+            attempts = self.attempts
+
+        breaker = self.breaker(endpoint := self.endpoint(method, url))
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                raise CircuitOpenError(f"circuit open for {endpoint}")
+
+            try:
+                result = await request()
+
+            except asyncio.CancelledError:
+                breaker.probing = False
+
+                raise
+
+            except Exception as e:
+                if (retryable := self.retryable(e)) and not (
+                    isinstance(e, ClientResponseError)
+                    and e.status == HTTPStatus.TOO_MANY_REQUESTS
+                ):
+                    breaker.failure()
+
+                else:
+                    breaker.success()
+
+                if not retryable or attempt + 1 >= attempts:
+                    raise
+
+                logger.warning(
+                    "%s failed on attempt %d/%d, retrying: %r",
+                    endpoint,
+                    attempt + 1,
+                    attempts,
+                    e,
+                )
+
+                if (
+                    isinstance(e, ClientResponseError)
+                    and e.status == HTTPStatus.TOO_MANY_REQUESTS
+                    and (throttle := throttled.get()) is not None
+                ):
+                    await throttle(e)
+
+                else:
+                    await asyncio.sleep(self.delay(attempt, e))
+
+            else:
+                breaker.success()
+
+                return result
@@ -0,0 +1,158 @@
+import asyncio
+from collections import OrderedDict, deque
+from datetime import timedelta
+from enum import IntEnum
+from time import monotonic
+from typing import Any, Awaitable, Callable, Hashable, TypedDict
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+class Statistics(TypedDict):
+    depth: int
+    submitted: int
+    started: int
+    expired: int
+    wait_time: float
+    max_wait_time: float
+
+
+class Scheduler:
+    class Job:
+        __slots__ = ("priority", "target", "enqueued", "deadline", "future")
+
+        def __init__(
+            self, priority: Priority, target: Hashable, deadline: float | None
+        ) -> None:
+            self.priority = priority
+            self.target = target
+            self.enqueued = monotonic()
+            self.deadline = deadline
+            self.future: asyncio.Future[None] = (
+                asyncio.get_running_loop().create_future()
+            )
+
+    __slots__ = ("concurrency", "active", "queues", "counters")
+
+    def __init__(self, concurrency: int = 8) -> None:
+        if concurrency < 1:
+            raise ValueError("parameter `concurrency` must be positive")
+
+        self.concurrency = concurrency
+        self.active = 0
+
+        self.queues: dict[Priority, OrderedDict[Hashable, deque[Scheduler.Job]]] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self.counters: dict[Priority, Statistics] = {
+            priority: Statistics(
+                depth=0,
+                submitted=0,
+                started=0,
+                expired=0,
+                wait_time=0.0,
+                max_wait_time=0.0,
+            )
+            for priority in Priority
+        }
+
+    def __len__(self) -> int:
+        return sum(statistics["depth"] for statistics in self.counters.values())
+
+    def statistics(self) -> dict[Priority, Statistics]:
+        return {
+            priority: Statistics(**statistics)
+            for priority, statistics in self.counters.items()
+        }
+
+    async def __call__(
+        self,
+        func: Callable[[], Awaitable[Any]],
+        *,
+        priority: Priority = Priority.NORMAL,
+        target: Hashable = None,
+        deadline: float | int | timedelta | None = None,
+    ) -> Any:
+        if isinstance(deadline, timedelta):
+            deadline = deadline.total_seconds()
+
+        statistics = self.counters[priority]
+        statistics["submitted"] += 1
+
+        if self.active < self.concurrency and not len(self):
+            self.active += 1
+
+            statistics["started"] += 1
+
+        else:
+            job = self.Job(
+                priority, target, None if deadline is None else monotonic() + deadline
+            )
+
+            self.queues[priority].setdefault(target, deque()).append(job)
+
+            statistics["depth"] += 1
+
+            try:
+                await job.future
+
+            except asyncio.CancelledError:
+                if not job.future.cancelled():
+                    self.release()
+
+                raise
+
+        try:
+            return await func()
+
+        finally:
+            self.release()
+
+    def next(self) -> "Scheduler.Job | None":
+        for priority, queue in self.queues.items():
+            while queue:
+                target, jobs = next(iter(queue.items()))
+
+                job = jobs.popleft()
+
+                if jobs:
+                    queue.move_to_end(target)
+
+                else:
+                    del queue[target]
+
+                self.counters[priority]["depth"] -= 1
+
+                if not job.future.done():
+                    return job
+
+        return None
+
+    def release(self) -> None:
+        self.active -= 1
+
+        while self.active < self.concurrency and (job := self.next()):
+            now = monotonic()
+
+            statistics = self.counters[job.priority]
+
+            if job.deadline is not None and now > job.deadline:
+                statistics["expired"] += 1
+
+                job.future.set_exception(
+                    TimeoutError(f"send deadline exceeded for {job.target!r}")
+                )
+
+                continue
+
+            statistics["started"] += 1
+            statistics["wait_time"] += (wait := now - job.enqueued)
+            statistics["max_wait_time"] = max(statistics["max_wait_time"], wait)
+
+            self.active += 1
+
+            job.future.set_result(None)
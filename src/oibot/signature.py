@@ -0,0 +1,49 @@
+from functools import lru_cache
+from time import time
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+    Ed25519PrivateKey,
+    Ed25519PublicKey,
+)
+
+
+@lru_cache(maxsize=256)
+def key_pair(app_secret: str) -> tuple[Ed25519PrivateKey, Ed25519PublicKey]:
+    seed = app_secret.encode("utf-8")
+
+    if not seed:
+        raise ValueError("parameter `app_secret` must not be empty")
+
+    while len(seed) < 32:
+        seed *= 2
+
+    private_key = Ed25519PrivateKey.from_private_bytes(seed[:32])
+
+    return private_key, private_key.public_key()
+
+
+def sign(app_secret: str, data: bytes) -> str:
+    return key_pair(app_secret)[0].sign(data).hex()
+
+
+def verify(
+    app_secret: str,
+    signature: str,
+    timestamp: str,
+    body: bytes,
+    *,
+    skew: float | None = None,
+) -> bool:
+    try:
+        if skew is not None and abs(time() - int(timestamp)) > skew:
+            return False
+
+        key_pair(app_secret)[1].verify(
+            bytes.fromhex(signature), timestamp.encode("utf-8") + body
+        )
+
+    except (InvalidSignature, ValueError):
+        return False
+
+    return True
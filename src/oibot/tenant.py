@@ -0,0 +1,146 @@
+import asyncio
+from datetime import timedelta
+from typing import Iterable, Iterator
+
+from oibot.api.upload_file import UploadCache
+from oibot.cache import TTLCache
+from oibot.limiter import Limiter
+from oibot.plugin import SessionManager
+from oibot.scheduler import Scheduler
+
+
+class Tenant:
+    __slots__ = (
+        "app_id",
+        "app_secret",
+        "plugins",
+        "session_manager",
+        "tokens",
+        "limiter",
+        "scheduler",
+        "uploads",
+    )
+
+    def __init__(
+        self,
+        app_id: str | None = None,
+        app_secret: str | None = None,
+        *,
+        plugins: Iterable[str] | None = None,
+    ) -> None:
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.plugins = None if plugins is None else frozenset(plugins)
+
+        self.session_manager = SessionManager()
+        self.tokens: dict[tuple[str, str], asyncio.Future[str]] = {}
+        self.limiter = Limiter()
+        self.scheduler = Scheduler()
+        self.uploads = UploadCache()
+
+    def __repr__(self) -> str:
+        return f"<Tenant app_id={self.app_id!r}>"
+
+    @property
+    def idle(self) -> bool:
+        self.limiter.sweep()
+
+        return not (
+            self.session_manager.sessions
+            or len(self.limiter)
+            or self.scheduler.active
+            or len(self.scheduler)
+        )
+
+
+class Tenants:
+    __slots__ = (
+        "default",
+        "configs",
+        "tenants",
+        "query_secrets",
+        "evicted",
+    )
+
+    def __init__(
+        self,
+        app_id: str | None = None,
+        app_secret: str | None = None,
+        *,
+        ttl: float | int | timedelta = timedelta(hours=1),
+        maxsize: int = 1024,
+        query_secrets: bool = False,
+    ) -> None:
+        self.default = Tenant(app_id, app_secret)
+        self.configs: dict[str, tuple[str | None, frozenset[str] | None]] = {}
+        self.tenants = TTLCache(
+            ttl, maxsize, evictable=lambda tenant: tenant.idle, on_evict=self.dropped
+        )
+        self.query_secrets = query_secrets
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.tenants)
+
+    def __iter__(self) -> Iterator[Tenant]:
+        yield self.default
+
+        yield from self.tenants.values()
+
+    def __contains__(self, app_id: str) -> bool:
+        return app_id in self.tenants or app_id in self.configs
+
+    def register(
+        self,
+        app_id: str,
+        app_secret: str | None = None,
+        *,
+        plugins: Iterable[str] | None = None,
+    ) -> None:
+        self.configs[app_id] = (
+            app_secret,
+            None if plugins is None else frozenset(plugins),
+        )
+
+        if tenant := self.tenants.pop(app_id, None):
+            tenant.tokens.clear()
+
+    def unregister(self, app_id: str) -> None:
+        self.configs.pop(app_id, None)
+
+        if tenant := self.tenants.pop(app_id, None):
+            tenant.tokens.clear()
+
+    def get(self, app_id: str | None, app_secret: str | None = None) -> Tenant | None:
+        if app_id is None or app_id == self.default.app_id:
+            return self.default
+
+        if not self.query_secrets:
+            app_secret = None
+
+        if tenant := self.tenants.get(app_id):
+            self.tenants.expire(app_id, self.tenants.ttl)
+
+        elif config := self.configs.get(app_id):
+            secret, plugins = config
+
+            self.tenants.set(
+                app_id,
+                tenant := Tenant(app_id, secret or app_secret, plugins=plugins),
+            )
+
+        elif not app_secret:
+            return self.default if self.default.app_secret else None
+
+        else:
+            self.tenants.set(
+                app_id,
+                tenant := Tenant(app_id, app_secret, plugins=self.default.plugins),
+            )
+
+        return tenant if app_id in self else None
+
+    def dropped(self, app_id: str, tenant: Tenant) -> None:
+        tenant.tokens.clear()
+
+        self.evicted += 1
@@ -0,0 +1,99 @@
+import asyncio
+
+from oibot.api import access_token
+from oibot.api.access_token import AccessToken, AccessTokenMixin, TokenStore
+
+
+class Client(AccessTokenMixin):
+    def __init__(self, *lifetimes: int, token_store: TokenStore | None = None) -> None:
+        self.futures = {}
+        self.token_store = token_store
+        self.lifetimes = list(lifetimes)
+        self.calls = 0
+
+    async def get_app_access_token(self, app_id: str, app_secret: str) -> AccessToken:
+        self.calls += 1
+
+        await asyncio.sleep(0.01)
+
+        return AccessToken(
+            access_token=f"token-{self.calls}",
+            expires_in=str(self.lifetimes.pop(0) if self.lifetimes else 7200),
+        )
+
+
+def test_concurrent_callers_share_one_fetch():
+    async def main() -> tuple[list[str], int]:
+        client = Client()
+
+        tokens = await asyncio.gather(
+            *(client.get_access_token("app", "secret") for _ in range(5))
+        )
+
+        return tokens, client.calls
+
+    assert asyncio.run(main()) == (["token-1"] * 5, 1)
+
+
+def test_tokens_are_refreshed_in_the_background(monkeypatch):
+    monkeypatch.setattr(access_token.random, "uniform", lambda a, b: 0.0)
+
+    async def main() -> tuple[str, str, int]:
+        client = Client(60)
+
+        first = await client.get_access_token("app", "secret")
+
+        await asyncio.sleep(0.05)
+
+        return first, await client.get_access_token("app", "secret"), client.calls
+
+    assert asyncio.run(main()) == ("token-1", "token-2", 2)
+
+
+def test_token_store_shares_tokens_across_clients(tmp_path):
+    async def main() -> tuple[list[str], list[int]]:
+        clients = [
+            Client(token_store=TokenStore(tmp_path / "tokens.json")) for _ in range(3)
+        ]
+
+        tokens = [await client.get_access_token("app", "secret") for client in clients]
+
+        return tokens, [client.calls for client in clients]
+
+    assert asyncio.run(main()) == (["token-1"] * 3, [1, 0, 0])
+
+
+def test_token_store_refetches_tokens_about_to_expire(tmp_path):
+    async def main() -> list[int]:
+        store = TokenStore(tmp_path / "tokens.json")
+
+        first, second = Client(30, token_store=store), Client(token_store=store)
+
+        await first.get_access_token("app", "secret")
+        await second.get_access_token("app", "secret")
+
+        return [first.calls, second.calls]
+
+    assert asyncio.run(main()) == [1, 1]
+
+
+def test_cancelled_waiter_releases_the_store_lock(tmp_path):
+    async def main() -> str:
+        store = TokenStore(tmp_path / "tokens.json")
+
+        held = store.acquire()
+
+        waiter = asyncio.create_task(
+            Client(token_store=store).get_access_token("a", "s")
+        )
+
+        await asyncio.sleep(0.05)
+
+        waiter.cancel()
+
+        store.release(held)
+
+        async with asyncio.timeout(1):
+            return await Client(token_store=store).get_access_token("a", "s")
+
+    assert asyncio.run(main()) == "token-1"
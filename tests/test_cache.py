@@ -0,0 +1,61 @@
+from time import sleep
+
+from oibot.cache import TTLCache
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(0.01)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+
+    sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_zero_ttl_expires_immediately_and_none_never_expires():
+    cache = TTLCache(0)
+    cache.set("a", 1)
+
+    assert "a" not in cache
+
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.expire("a", None)
+
+    assert cache.get("a") == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    evicted = []
+    cache = TTLCache(maxsize=2, on_evict=lambda key, value: evicted.append(key))
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert evicted == ["b"]
+    assert list(cache) == ["a", "c"]
+
+
+def test_busy_entries_are_renewed_instead_of_evicted():
+    busy = {"a"}
+    cache = TTLCache(0.01, maxsize=1, evictable=lambda value: value not in busy)
+
+    cache.set("a", "a")
+    cache.set("b", "b")
+
+    assert list(cache) == ["b", "a"]
+
+    sleep(0.02)
+
+    assert cache.get("a") == "a"
+
+    busy.clear()
+    sleep(0.02)
+    cache.sweep()
+
+    assert "a" not in cache
@@ -0,0 +1,31 @@
+import pytest
+
+from oibot.codec import Codec
+
+
+def codecs() -> list[Codec]:
+    codecs = [Codec.stdlib()]
+
+    try:
+        codecs.append(Codec.orjson())
+
+    except ImportError:
+        pass
+
+    return codecs
+
+
+@pytest.mark.parametrize("codec", codecs(), ids=repr)
+def test_round_trip_is_compact_utf8(codec):
+    payload = {"content": "你好", "msg_seq": 1, "media": None}
+
+    data = codec.dumps(payload)
+
+    assert isinstance(data, bytes)
+    assert data == '{"content":"你好","msg_seq":1,"media":null}'.encode("utf-8")
+    assert codec.loads(data) == payload
+    assert codec.loads(data.decode("utf-8")) == payload
+
+
+def test_default_prefers_orjson_when_available():
+    assert Codec.default().name == codecs()[-1].name
@@ -0,0 +1,249 @@
+import asyncio
+import json
+from contextvars import ContextVar
+from functools import partial
+from time import monotonic, sleep
+from types import ModuleType
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from oibot.bot import OiBot
+from oibot.dispatcher import Deduplicator, Dispatcher, Lanes
+from oibot.event.friend_add import FriendAddEvent
+from oibot.plugin import Plugin, on
+
+current: ContextVar[str] = ContextVar("current")
+
+
+@pytest.mark.parametrize("workers", [None, 1, 4])
+def test_queued_lane_jobs_keep_their_own_context(workers):
+    async def main() -> list[str]:
+        lanes, seen, gate = Lanes(lambda _: "lane"), [], asyncio.Event()
+
+        async def job() -> None:
+            await gate.wait()
+
+            seen.append(current.get())
+
+        dispatcher = None if workers is None else Dispatcher(workers)
+
+        if dispatcher is not None:
+            await dispatcher.__aenter__()
+
+        for name in "ABC":
+            current.set(name)
+
+            assert await lanes.submit(None, job, dispatcher)
+
+        gate.set()
+
+        while len(seen) < 3:
+            await asyncio.sleep(0.01)
+
+        if dispatcher is not None:
+            await dispatcher.__aexit__()
+
+        return seen
+
+    assert asyncio.run(main()) == ["A", "B", "C"]
+
+
+def test_exit_drains_queued_jobs():
+    async def main() -> list[int]:
+        dispatcher, done = Dispatcher(1), []
+
+        await dispatcher.__aenter__()
+
+        for i in range(3):
+
+            async def job(i: int = i) -> None:
+                await asyncio.sleep(0.01)
+
+                done.append(i)
+
+            assert await dispatcher.submit(job)
+
+        await dispatcher.__aexit__()
+
+        assert not await dispatcher.submit(job)
+
+        return done
+
+    assert asyncio.run(main()) == [0, 1, 2]
+
+
+def test_exit_drops_jobs_left_after_the_drain_timeout():
+    async def main() -> tuple[list[int], list[str]]:
+        dispatcher, gate = Dispatcher(1, drain_timeout=0.05), asyncio.Event()
+        lanes, dropped = Lanes(lambda _: "lane"), []
+
+        await dispatcher.__aenter__()
+
+        for i in range(3):
+            assert await dispatcher.submit(
+                gate.wait, on_drop=partial(dropped.append, i)
+            )
+
+        for name in "ABC":
+            assert await lanes.submit(
+                None, gate.wait, dispatcher, on_drop=partial(dropped.append, name)
+            )
+
+        await dispatcher.__aexit__()
+
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert not len(lanes)
+
+        return dropped, dispatcher.statistics()
+
+    dropped, statistics = asyncio.run(main())
+
+    assert dropped == [1, 2, "A", "B", "C"]
+    assert statistics["depth"] == 0
+
+
+@pytest.mark.parametrize("overflow", ["reject", "drop_oldest", "block"])
+def test_full_queue_applies_the_overflow_policy(overflow):
+    async def main() -> tuple[list, dict, bool, bool]:
+        dispatcher = Dispatcher(1, 1, overflow=overflow, drain_timeout=1)
+        gate, dropped = asyncio.Event(), []
+
+        await dispatcher.__aenter__()
+
+        assert await dispatcher.submit(gate.wait)
+
+        await asyncio.sleep(0)
+
+        assert await dispatcher.submit(gate.wait, on_drop=partial(dropped.append, 1))
+
+        third = asyncio.create_task(
+            dispatcher.submit(gate.wait, on_drop=partial(dropped.append, 2))
+        )
+
+        await asyncio.sleep(0.01)
+
+        blocked = not third.done()
+
+        gate.set()
+
+        accepted = await third
+
+        await dispatcher.__aexit__()
+
+        return dropped, dispatcher.statistics(), blocked, accepted
+
+    dropped, statistics, blocked, accepted = asyncio.run(main())
+
+    match overflow:
+        case "reject":
+            assert (dropped, accepted, statistics["rejected"]) == ([], False, 1)
+            assert statistics["completed"] == 2
+
+        case "drop_oldest":
+            assert (dropped, accepted, statistics["dropped"]) == ([1], True, 1)
+            assert statistics["completed"] == 2
+
+        case "block":
+            assert blocked and accepted
+            assert statistics["completed"] == 3
+
+
+def test_lanes_serialize_each_conversation_and_run_others_in_parallel():
+    async def main() -> tuple[list[str], float]:
+        lanes, order = Lanes(lambda key: key, maxsize=2), []
+        dispatcher = Dispatcher(4)
+
+        await dispatcher.__aenter__()
+
+        def job(name: str):
+            async def run() -> None:
+                order.append(f"{name}+")
+
+                await asyncio.sleep(0.03)
+
+                order.append(f"{name}-")
+
+            return run
+
+        start = monotonic()
+
+        for key, name in [("a", "a1"), ("b", "b1"), ("a", "a2"), ("a", "a3")]:
+            assert await lanes.submit(key, job(name), dispatcher)
+
+        assert not await lanes.submit("a", job("a4"), dispatcher)
+
+        while len(lanes):
+            await asyncio.sleep(0.01)
+
+        elapsed = monotonic() - start
+
+        await dispatcher.__aexit__()
+
+        return order, elapsed
+
+    order, elapsed = asyncio.run(main())
+
+    lane = [step for step in order if step.startswith("a")]
+
+    assert lane == ["a1+", "a1-", "a2+", "a2-", "a3+", "a3-"]
+    assert order.index("b1+") < order.index("a1-")
+    assert elapsed < 0.15
+
+
+def test_deduplicator_drops_redeliveries_within_ttl():
+    deduplicator = Deduplicator(ttl=0.02, maxsize=2)
+
+    assert not deduplicator({"id": "e1", "d": {"id": "m1"}})
+    assert deduplicator({"id": "e1"})
+    assert deduplicator({"id": "e2", "d": {"id": "m1"}})
+    assert deduplicator.duplicates == 2
+
+    deduplicator.forget({"id": "e1", "d": {"id": "m1"}})
+
+    assert not deduplicator({"id": "e1"})
+
+    for i in range(5):
+        deduplicator({"id": str(i)})
+
+    assert len(deduplicator) == 2
+
+    sleep(0.03)
+
+    assert not deduplicator({"id": "4"})
+
+
+def test_webhook_redeliveries_are_acknowledged_without_running_plugins():
+    async def main() -> list[str]:
+        bot, seen = OiBot(app_id="app", deduplicator=Deduplicator()), []
+
+        module = ModuleType("counter")
+
+        async def count(event: FriendAddEvent) -> None:
+            seen.append(event.id)
+
+        count.__module__ = "counter"
+        module.count = on()(count)
+        bot.plugin_manager.plugins["counter"] = Plugin(module)
+
+        body = json.dumps(
+            {
+                "op": 0,
+                "id": "delivery",
+                "t": "FRIEND_ADD",
+                "d": {"id": "event", "openid": "u", "timestamp": 0},
+            }
+        )
+
+        async with TestClient(TestServer(bot.app)) as client:
+            for _ in range(3):
+                async with client.post("/", data=body) as resp:
+                    assert resp.status == 200
+
+            await asyncio.sleep(0.01)
+
+        return seen
+
+    assert asyncio.run(main()) == ["event"]
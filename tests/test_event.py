@@ -0,0 +1,48 @@
+import pytest
+
+from oibot.event import Event
+from oibot.event.c2c_message_create import C2CMessageCreateEvent
+
+
+def ctx() -> dict:
+    return {
+        "op": 0,
+        "id": "delivery",
+        "t": "C2C_MESSAGE_CREATE",
+        "d": {
+            "id": "message",
+            "content": "hi",
+            "author": {"id": "a", "user_openid": "u", "union_openid": "n"},
+            "timestamp": 0,
+            "attachments": [
+                {"content_type": "image/png", "filename": "a.png", "url": "https://x"}
+            ],
+        },
+    }
+
+
+def test_events_dispatch_to_slotted_subclasses():
+    event = Event(None, ctx())
+
+    assert type(event) is C2CMessageCreateEvent
+    assert not hasattr(event, "__dict__")
+    assert "author" in C2CMessageCreateEvent.__slots__
+
+
+def test_decoded_fields_are_cached_in_slots():
+    event = Event(None, ctx())
+
+    author = event.author
+
+    assert author == C2CMessageCreateEvent.Author("a", "u", "n")
+    assert event.author is author
+    assert event.attachments[0].filename == "a.png"
+    assert event.content == "hi"
+    assert event["id"] == "delivery"
+
+
+def test_unknown_fields_raise_attribute_error():
+    event = Event(None, ctx())
+
+    with pytest.raises(AttributeError, match="missing"):
+        event.missing
@@ -0,0 +1,140 @@
+import asyncio
+from time import monotonic
+
+import pytest
+
+from oibot.limiter import Limiter, retry_after
+from oibot.scheduler import Priority
+
+
+def test_high_priority_takes_the_next_slot():
+    async def main() -> list[str]:
+        limiter, order = Limiter(), []
+
+        async def send(name: str, priority: Priority) -> None:
+            await limiter.acquire("group", 10, 0.5, priority=priority)
+
+            order.append(name)
+
+        tasks = [asyncio.create_task(send(f"low-{i}", Priority.LOW)) for i in range(4)]
+
+        await asyncio.sleep(0.01)
+
+        tasks.append(asyncio.create_task(send("high", Priority.HIGH)))
+
+        await asyncio.gather(*tasks)
+
+        return order
+
+    assert asyncio.run(main()) == ["low-0", "high", "low-1", "low-2", "low-3"]
+
+
+def test_no_window_exceeds_limit():
+    limiter, now, sends = Limiter(), 0.0, []
+
+    for _ in range(100):
+        now += max(limiter.reserve("key", 5, 10.0, now, 3), 0)
+        sends.append(now)
+
+    assert max(sum(s <= t < s + 10.0 - 1e-9 for t in sends) for s in sends) <= 5
+
+
+def test_timeout_raises_without_reserving():
+    async def main() -> None:
+        limiter = Limiter()
+
+        await limiter.acquire("key", 1, 10.0)
+
+        tat = limiter.tats["key"]
+
+        with pytest.raises(TimeoutError):
+            await limiter.acquire("key", 1, 10.0, timeout=0.01)
+
+        assert limiter.tats["key"] == tat
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_consume_a_slot():
+    async def main() -> float:
+        limiter = Limiter()
+
+        await limiter.acquire("key", 20, 1.0)
+
+        task = asyncio.create_task(limiter.acquire("key", 20, 1.0))
+
+        await asyncio.sleep(0)
+
+        task.cancel()
+
+        start = monotonic()
+
+        await limiter.acquire("key", 20, 1.0)
+
+        return monotonic() - start
+
+    assert asyncio.run(main()) < 0.09
+
+
+async def granted_then_cancelled(limiter: Limiter, reserve_after: bool) -> float:
+    limiter.tats["key"] = monotonic() + 1
+
+    task = asyncio.create_task(limiter.acquire("key", 10, 1.0))
+
+    await asyncio.sleep(0)
+
+    limiter.tats["key"] = monotonic()
+    limiter.wake("key")
+
+    if reserve_after:
+        limiter.reserve("key", 10, 1.0, monotonic())
+
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    return limiter.tats["key"] - monotonic()
+
+
+def test_cancelled_grant_is_refunded():
+    assert asyncio.run(granted_then_cancelled(Limiter(), False)) <= 0
+
+
+def test_refund_skips_when_a_later_reservation_exists():
+    assert asyncio.run(granted_then_cancelled(Limiter(), True)) > 0.15
+
+
+def test_burst_is_immediate_then_paced():
+    limiter, now = Limiter(), 0.0
+
+    delays = [limiter.reserve("key", 5, 10.0, now, 3) for _ in range(4)]
+
+    assert [delay <= 0 for delay in delays] == [True, True, True, False]
+    assert delays[3] == pytest.approx(10.0 / 3)
+
+
+def test_idle_keys_are_swept():
+    limiter = Limiter(interval=0)
+
+    limiter.reserve("old", 60, 1.0, monotonic() - 10)
+    limiter.reserve("new", 60, 60.0, monotonic())
+
+    limiter.sweep()
+
+    assert list(limiter.tats) == ["new"]
+    assert len(limiter) == 1
+
+
+def test_penalty_delays_the_next_send():
+    limiter = Limiter()
+
+    limiter.penalize("key", 60, 60.0, 5.0)
+
+    assert limiter.delay("key", 60, 60.0, monotonic()) == pytest.approx(5.0, abs=0.1)
+
+
+def test_retry_after_parses_seconds_and_dates():
+    assert retry_after({"Retry-After": "3"}, 1.0) == 3.0
+    assert retry_after({"Retry-After": "garbage"}, 1.0) == 1.0
+    assert retry_after(None, 1.0) == 1.0
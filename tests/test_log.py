@@ -0,0 +1,65 @@
+import logging
+
+import pytest
+
+from oibot.log import Handler, Sampler, configure, log_event, logger, sampler
+
+
+class Capture(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+class Delivery:
+    def __init__(self, t: str, id: str) -> None:
+        self.ctx = {"t": t, "id": id}
+
+    def __repr__(self) -> str:
+        return f"Delivery({self.ctx['id']})"
+
+
+def test_sampler_keeps_one_in_every_interval():
+    sampler = Sampler({"noisy": 0.25, "muted": 0}, default=1)
+
+    assert [sampler("noisy") for _ in range(8)].count(True) == 2
+    assert not any(sampler("muted") for _ in range(8))
+    assert all(sampler("other") for _ in range(8))
+
+    with pytest.raises(ValueError):
+        Sampler({"bad": 2})
+
+
+def test_events_are_logged_through_the_queue_with_structured_fields():
+    capture, level = Capture(), logger.level
+
+    listener = configure(capture, level=logging.INFO, rates={"NOISY": 0.5})
+
+    try:
+        for i in range(4):
+            log_event(Delivery("NOISY", str(i)))
+
+        log_event(Delivery("QUIET", "q"))
+
+    finally:
+        listener.stop()
+
+        for handler in logger.handlers[:]:
+            if isinstance(handler, Handler):
+                logger.removeHandler(handler)
+
+        logger.propagate = True
+        logger.setLevel(level)
+        sampler.update()
+
+    assert [record.getMessage() for record in capture.records] == [
+        "Delivery(1)",
+        "Delivery(3)",
+        "Delivery(q)",
+    ]
+    assert capture.records[-1].event_type == "QUIET"
+    assert capture.records[-1].event_id == "q"
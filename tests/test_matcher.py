@@ -0,0 +1,215 @@
+import asyncio
+from collections import Counter
+from time import sleep
+from types import SimpleNamespace
+
+import pytest
+
+from oibot.matcher import Matcher, Router, Schedule
+
+
+def counted(calls: Counter, name: str, result, *, delay=0.0, pure=False) -> Matcher:
+    def rule(*args, **kwargs):
+        calls[name] += 1
+
+        if delay:
+            sleep(delay)
+
+        return result
+
+    return Matcher(rule, pure=pure)
+
+
+def test_or_keeps_declaration_order_for_impure_children():
+    calls = Counter()
+
+    matcher = (
+        counted(calls, "slow", False, delay=0.001)
+        | counted(calls, "first", {"x": 1})
+        | counted(calls, "second", {"x": 2})
+    )
+
+    for _ in range(200):
+        assert matcher(None) == {"x": 1}
+
+    assert calls == {"slow": 200, "first": 200}
+
+
+def test_or_reorders_pure_children_and_short_circuits():
+    calls = Counter()
+
+    matcher = counted(calls, "slow", False, delay=0.001, pure=True) | counted(
+        calls, "fast", True, pure=True
+    )
+
+    assert matcher.pure
+
+    for _ in range(200):
+        assert matcher(None) == {"_": True}
+
+    assert calls["fast"] == 200
+    assert calls["slow"] < 100
+
+
+def test_and_stops_at_first_rejection():
+    calls = Counter()
+
+    matcher = counted(calls, "slow", True, delay=0.001) & counted(
+        calls, "reject", False
+    )
+
+    for _ in range(200):
+        assert matcher(None) == {}
+
+    assert calls["reject"] == 200
+    assert calls["slow"] < 100
+
+
+def test_concurrent_children_record_timings():
+    async def check(*args, **kwargs) -> bool:
+        await asyncio.sleep(0)
+
+        return True
+
+    async def main() -> Matcher:
+        matcher = Matcher.all(Matcher(check), Matcher(check))
+
+        for _ in range(10):
+            assert await matcher(None) == {"_": True}
+
+        return matcher
+
+    matcher = asyncio.run(main())
+
+    (schedule,) = (
+        cell.cell_contents
+        for cell in matcher.rule.__closure__
+        if isinstance(cell.cell_contents, Schedule)
+    )
+
+    assert [statistics.calls for statistics in schedule.statistics] == [10, 10]
+
+
+def test_router_matches_the_longest_command_at_a_word_boundary():
+    router = Router()
+
+    for command in ("/echo", "/echoall", "/e"):
+        router.add(command)
+
+    assert router.route("/echo hi there") == ("/echo", "hi there")
+    assert router.route("  /echoall") == ("/echoall", "")
+    assert router.route("/e x") == ("/e", "x")
+    assert router.route("/echox") is None
+    assert router.route("hello") is None
+
+
+def test_command_matcher_extracts_arguments():
+    matcher = Matcher.command("/ban", params=["user", "minutes"])
+
+    assert matcher(SimpleNamespace(content="/ban alice 10")) == {
+        "command": "/ban",
+        "args": ["alice", "10"],
+        "user": "alice",
+        "minutes": "10",
+    }
+    assert matcher(SimpleNamespace(content="/bank")) == {}
+    assert matcher(SimpleNamespace(content=None)) == {}
+
+
+class Probe:
+    pass
+
+
+def test_memoized_matcher_runs_once_per_event():
+    calls = Counter()
+
+    shared = counted(calls, "shared", {"level": 1}).memoize()
+
+    first = shared & Matcher(lambda event: True)
+    second = shared & Matcher(lambda event: True)
+
+    event = Probe()
+
+    assert first(event) == {"level": 1, "_": True}
+
+    second(event)["level"] = 2
+
+    assert second(event) == {"level": 1, "_": True}
+    assert calls["shared"] == 1
+
+    first(Probe())
+
+    assert calls["shared"] == 2
+
+
+def test_memoized_async_matcher_coalesces_concurrent_calls():
+    calls = Counter()
+
+    async def check(event) -> bool:
+        calls["check"] += 1
+
+        await asyncio.sleep(0.01)
+
+        return True
+
+    shared = Matcher(check).memoize()
+
+    async def main() -> list:
+        event = Probe()
+
+        return await asyncio.gather(shared(event), shared(event), shared(event))
+
+    assert asyncio.run(main()) == [True, True, True]
+    assert calls["check"] == 1
+
+
+def test_cached_matcher_honours_ttl_and_negative_ttl():
+    calls = Counter()
+
+    def allowed(user: str) -> bool:
+        calls[user] += 1
+
+        return user == "admin"
+
+    matcher = Matcher(allowed).cache(lambda user: user, ttl=60, negative_ttl=0.01)
+
+    assert [matcher("admin") for _ in range(3)] == [True] * 3
+    assert [matcher("guest") for _ in range(2)] == [False] * 2
+    assert calls == {"admin": 1, "guest": 1}
+
+    sleep(0.02)
+
+    matcher("admin")
+    matcher("guest")
+
+    assert calls == {"admin": 1, "guest": 2}
+
+
+def test_cached_async_matcher_coalesces_and_drops_failures():
+    calls = Counter()
+
+    async def allowed(user: str) -> dict:
+        calls[user] += 1
+
+        await asyncio.sleep(0.01)
+
+        if user == "broken":
+            raise RuntimeError(user)
+
+        return {"user": user}
+
+    matcher = Matcher(allowed).cache(lambda user: user, maxsize=1)
+
+    async def main() -> None:
+        assert await asyncio.gather(matcher("a"), matcher("a")) == [{"user": "a"}] * 2
+
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await matcher("broken")
+
+        await matcher("b")
+        await matcher("a")
+
+    asyncio.run(main())
+
+    assert calls == {"a": 2, "broken": 2, "b": 1}
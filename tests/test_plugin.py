@@ -0,0 +1,250 @@
+import asyncio
+from inspect import signature
+from time import monotonic
+from types import ModuleType
+from typing import Any, Callable
+
+import pytest
+
+from oibot.event import Event
+from oibot.event.c2c_message_create import C2CMessageCreateEvent
+from oibot.event.group_at_message_create import GroupAtMessageCreateEvent
+from oibot.matcher import Matcher
+from oibot.plugin import Cache, Dependency, Plugin, PluginManager, on
+
+
+def c2c(content: str = "hi") -> Event:
+    return Event(
+        None,
+        {
+            "op": 0,
+            "id": "1",
+            "t": "C2C_MESSAGE_CREATE",
+            "d": {
+                "id": "1",
+                "content": content,
+                "author": {"id": "u", "user_openid": "u", "union_openid": "u"},
+                "timestamp": 0,
+            },
+        },
+    )
+
+
+def plugin(name: str, **handlers: Callable[..., Any]) -> Plugin:
+    module = ModuleType(name)
+
+    for attr, handler in handlers.items():
+        handler.__module__ = name
+
+        setattr(module, attr, on()(handler))
+
+    return Plugin(module)
+
+
+def filled(cache: Cache, key: str, closed: list[str]) -> Cache.Entry:
+    entry = cache.create(key)
+    entry.stack.callback(closed.append, key)
+    entry.future.set_result(key)
+
+    return entry
+
+
+def test_expired_entries_are_swept_on_access():
+    async def main() -> list[str]:
+        cache, closed = Cache(ttl=0.01), []
+
+        filled(cache, "a", closed)
+
+        await asyncio.sleep(0.02)
+
+        assert cache.get("b") is None
+
+        await asyncio.sleep(0)
+
+        assert len(cache) == 0
+
+        return closed
+
+    assert asyncio.run(main()) == ["a"]
+
+
+def test_entries_being_created_are_never_evicted():
+    async def main() -> list[str]:
+        cache, closed = Cache(ttl=0.01, maxsize=1), []
+
+        pending = cache.create("a")
+        pending.stack.callback(closed.append, "a")
+
+        filled(cache, "b", closed)
+        filled(cache, "c", closed)
+
+        await asyncio.sleep(0.02)
+
+        assert cache.get("a") is pending
+
+        await asyncio.sleep(0)
+
+        pending.future.set_result("a")
+
+        await asyncio.sleep(0.02)
+
+        assert cache.get("a") is None
+
+        await asyncio.sleep(0)
+
+        return closed
+
+    assert asyncio.run(main()) == ["b", "c", "a"]
+
+
+def test_aclose_all_closes_every_entry():
+    async def main() -> list[str]:
+        closed = []
+
+        filled(first := Cache(), "a", closed)
+        filled(second := Cache(ttl=60), "b", closed)
+
+        await Cache.aclose_all()
+
+        assert len(first) == len(second) == 0
+
+        return closed
+
+    assert sorted(asyncio.run(main())) == ["a", "b"]
+
+
+def test_executors_are_indexed_by_event_type_and_plugin_set():
+    seen = []
+
+    async def private(event: C2CMessageCreateEvent) -> None:
+        seen.append("private")
+
+    async def group(event: GroupAtMessageCreateEvent) -> None:
+        seen.append("group")
+
+    async def anything(event: Event) -> None:
+        seen.append("anything")
+
+    manager = PluginManager()
+    manager.plugins = {
+        "a": plugin("a", private=private, anything=anything),
+        "b": plugin("b", group=group),
+    }
+
+    executors = manager.dispatch(C2CMessageCreateEvent)
+
+    assert [executor.func.__name__ for executor in executors] == [
+        "private",
+        "anything",
+    ]
+    assert manager.dispatch(C2CMessageCreateEvent) is executors
+    assert [
+        executor.func.__name__
+        for executor in manager.dispatch(GroupAtMessageCreateEvent)
+    ] == ["anything", "group"]
+    assert manager.dispatch(C2CMessageCreateEvent, frozenset({"b"})) == []
+
+    asyncio.run(manager(c2c()))
+
+    assert sorted(seen) == ["anything", "private"]
+
+
+def test_plan_resolves_shared_dependencies_once_and_in_parallel():
+    calls = []
+
+    def config() -> dict:
+        calls.append("config")
+
+        return {"name": "db"}
+
+    async def users(config: dict = Dependency(config)) -> str:
+        await asyncio.sleep(0.05)
+
+        return f"{config['name']}.users"
+
+    async def groups(config: dict = Dependency(config)) -> str:
+        await asyncio.sleep(0.05)
+
+        return f"{config['name']}.groups"
+
+    def session(config: dict = Dependency(config)):
+        calls.append("enter")
+
+        yield config["name"]
+
+        calls.append("exit")
+
+    @on(Matcher.command("/who", params=["name"]))
+    async def handler(
+        event: C2CMessageCreateEvent,
+        name: str,
+        users: str = Dependency(users),
+        groups: str = Dependency(groups),
+        session: str = Dependency(session),
+    ) -> tuple[str, ...]:
+        calls.append("handler")
+
+        return name, users, groups, session
+
+    start = monotonic()
+
+    assert asyncio.run(handler(c2c("/who alice"))) == (
+        "alice",
+        "db.users",
+        "db.groups",
+        "db",
+    )
+    assert monotonic() - start < 0.09
+    assert calls == ["config", "enter", "handler", "exit"]
+
+
+def test_plan_rejects_circular_and_unresolvable_dependencies():
+    def loop(value: Any = None) -> Any:
+        return value
+
+    dependency = Dependency(loop)
+    loop.__defaults__ = (dependency,)
+    dependency.signature = signature(loop)
+
+    async def circular(event: Event, value: Any = dependency) -> None:
+        pass
+
+    with pytest.raises(ValueError, match="circular"):
+        on()(circular)
+
+    def unresolved(missing: int) -> int:
+        return missing
+
+    async def handler(event: Event, value: int = Dependency(unresolved)) -> None:
+        pass
+
+    with pytest.raises(ValueError, match="missing"):
+        on()(handler)
+
+
+def test_user_scoped_dependency_is_cached_across_events():
+    calls = []
+
+    async def profile(event: C2CMessageCreateEvent):
+        calls.append("load")
+
+        yield event.author.user_openid
+
+        calls.append("close")
+
+    @on()
+    async def handler(
+        event: C2CMessageCreateEvent,
+        profile: str = Dependency(profile, scope="user", ttl=60),
+    ) -> str:
+        return profile
+
+    async def main() -> None:
+        assert [await handler(c2c()) for _ in range(3)] == ["u", "u", "u"]
+        assert calls == ["load"]
+
+        await Cache.aclose_all()
+
+    asyncio.run(main())
+
+    assert calls == ["load", "close"]
@@ -0,0 +1,71 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from oibot.bot import OiBot
+from oibot.pool import Pool
+
+
+def test_session_uses_pool_settings():
+    async def main() -> None:
+        pool = Pool(10, 2, keepalive=5, dns_ttl=None)
+
+        async with pool.session("https://example.com") as session:
+            connector = session.connector
+
+            assert connector.limit == 10
+            assert connector.limit_per_host == 2
+            assert not connector.use_dns_cache
+
+    asyncio.run(main())
+
+
+def test_warmup_opens_connections_and_tolerates_failures():
+    async def main() -> int:
+        peers = set()
+
+        async def index(request: web.Request) -> web.Response:
+            peers.add(request.transport.get_extra_info("peername"))
+
+            await asyncio.sleep(0.01)
+
+            return web.Response(status=404)
+
+        app = web.Application()
+        app.router.add_get("/", index)
+
+        pool = Pool(warm=3)
+
+        async with TestServer(app) as server:
+            async with pool.session(str(server.make_url(""))) as session:
+                await pool.warmup(session, "/")
+                await pool.warmup(session, "http://127.0.0.1:1/")
+
+        return len(peers)
+
+    assert asyncio.run(main()) == 3
+
+
+def test_serve_starts_when_warmup_times_out(monkeypatch):
+    started = []
+
+    async def warmup(self) -> None:
+        await asyncio.Event().wait()
+
+    async def start(self) -> None:
+        started.append(self)
+
+    monkeypatch.setattr(OiBot, "warmup", warmup)
+    monkeypatch.setattr(web.TCPSite, "start", start)
+
+    async def main() -> None:
+        task = asyncio.create_task(OiBot().serve(port=0, warmup_timeout=0.01))
+
+        await asyncio.sleep(0.1)
+
+        task.cancel()
+
+    asyncio.run(main())
+
+    assert len(started) == 1
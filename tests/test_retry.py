@@ -0,0 +1,96 @@
+import asyncio
+from http import HTTPMethod, HTTPStatus
+from time import monotonic
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import ClientResponseError
+
+from oibot.api.send_message import rate_limit
+from oibot.limiter import Limiter
+from oibot.retry import Breaker, CircuitOpenError, Retry
+
+
+def failure(status: HTTPStatus, **headers: str) -> ClientResponseError:
+    return ClientResponseError(None, (), status=status, headers=headers)
+
+
+def flaky(*errors: BaseException) -> tuple[list[float], object]:
+    calls, errors = [], list(errors)
+
+    async def request() -> str:
+        calls.append(monotonic())
+
+        if errors:
+            raise errors.pop(0)
+
+        return "ok"
+
+    return calls, request
+
+
+@pytest.mark.parametrize(
+    ("method", "url", "body", "expected"),
+    [
+        (HTTPMethod.POST, "/v2/users/1/messages", {"msg_seq": 1}, True),
+        (HTTPMethod.POST, "/v2/users/1/messages", {"content": "hi"}, False),
+        (HTTPMethod.POST, "/v2/users/1/files", {"srv_send_msg": True}, False),
+        (HTTPMethod.POST, "/v2/users/1/files", {"srv_send_msg": False}, True),
+        (HTTPMethod.DELETE, "/v2/users/1/messages/2", {}, True),
+    ],
+)
+def test_idempotent(method, url, body, expected):
+    assert Retry.idempotent(method, url, body) is expected
+
+
+def test_non_idempotent_requests_are_sent_once():
+    calls, request = flaky(failure(HTTPStatus.BAD_GATEWAY))
+
+    with pytest.raises(ClientResponseError):
+        asyncio.run(Retry(backoff=0)("POST", "https://h/v2/x", request, attempts=1))
+
+    assert len(calls) == 1
+
+
+def test_retryable_failures_are_retried():
+    calls, request = flaky(failure(HTTPStatus.BAD_GATEWAY))
+
+    assert asyncio.run(Retry(backoff=0)("POST", "https://h/v2/x", request)) == "ok"
+    assert len(calls) == 2
+
+
+def test_rate_limited_retries_wait_on_the_limiter():
+    limiter = Limiter()
+    bot = SimpleNamespace(tenant=SimpleNamespace(limiter=limiter))
+    retry = Retry(backoff=0)
+    calls, request = flaky(
+        failure(HTTPStatus.TOO_MANY_REQUESTS, **{"Retry-After": "0.2"})
+    )
+
+    @rate_limit(10, 1, name="test")
+    async def send(self, **kwargs) -> str:
+        return await retry("POST", "https://h/v2/users/1/messages", request)
+
+    assert asyncio.run(send(bot)) == "ok"
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.2
+    assert limiter.tats[("test", None)] > calls[1]
+
+
+def test_breaker_opens_after_threshold():
+    breaker = Breaker(2, 60)
+
+    breaker.failure()
+    assert breaker.allow()
+
+    breaker.failure()
+    assert not breaker.allow()
+
+    calls, request = flaky()
+    retry = Retry(threshold=1, cooldown=60)
+    retry.breaker(Retry.endpoint("GET", "https://h/v2/x")).failure()
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(retry("GET", "https://h/v2/x", request))
+
+    assert not calls
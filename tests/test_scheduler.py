@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from oibot.scheduler import Priority, Scheduler
+
+
+def test_queued_jobs_start_by_priority_then_round_robin():
+    async def main() -> list[str]:
+        scheduler, order = Scheduler(1), []
+        gate = asyncio.Event()
+
+        async def job(name: str) -> None:
+            order.append(name)
+
+            await gate.wait()
+
+        first = asyncio.create_task(scheduler(lambda: job("first")))
+
+        await asyncio.sleep(0)
+
+        tasks = [
+            asyncio.create_task(
+                scheduler(lambda name=name: job(name), priority=priority, target=target)
+            )
+            for name, priority, target in [
+                ("low", Priority.LOW, None),
+                ("a1", Priority.NORMAL, "a"),
+                ("a2", Priority.NORMAL, "a"),
+                ("b1", Priority.NORMAL, "b"),
+                ("high", Priority.HIGH, None),
+            ]
+        ]
+
+        await asyncio.sleep(0)
+
+        assert len(scheduler) == 5
+
+        gate.set()
+
+        await asyncio.gather(first, *tasks)
+
+        return order
+
+    assert asyncio.run(main()) == ["first", "high", "a1", "b1", "a2", "low"]
+
+
+def test_jobs_past_their_deadline_are_expired():
+    async def main() -> Scheduler:
+        scheduler = Scheduler(1)
+
+        async def slow() -> None:
+            await asyncio.sleep(0.02)
+
+        running = asyncio.create_task(scheduler(slow))
+
+        await asyncio.sleep(0)
+
+        with pytest.raises(TimeoutError):
+            await scheduler(slow, target="late", deadline=0.01)
+
+        await running
+
+        return scheduler
+
+    statistics = asyncio.run(main()).statistics()[Priority.NORMAL]
+
+    assert statistics["submitted"] == 2
+    assert statistics["started"] == 1
+    assert statistics["expired"] == 1
+    assert statistics["depth"] == 0
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    async def main() -> Scheduler:
+        scheduler = Scheduler(1)
+        gate = asyncio.Event()
+
+        running = asyncio.create_task(scheduler(gate.wait))
+        waiting = asyncio.create_task(scheduler(gate.wait))
+
+        await asyncio.sleep(0)
+
+        waiting.cancel()
+        gate.set()
+
+        await running
+
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        return scheduler
+
+    scheduler = asyncio.run(main())
+
+    assert scheduler.active == 0
+    assert len(scheduler) == 0
+
+
+def test_concurrency_must_be_positive():
+    with pytest.raises(ValueError, match="concurrency"):
+        Scheduler(0)
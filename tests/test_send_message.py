@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from oibot.api.send_message import SendMessageMixin
+from oibot.scheduler import Priority
+
+
+def bot(failing: set[str] = frozenset(), delay: float = 0.01) -> SimpleNamespace:
+    stub = SimpleNamespace(active=0, peak=0, calls=[])
+
+    async def send_message(message, *, group_openid: str, **kwargs) -> dict:
+        stub.calls.append((group_openid, kwargs))
+        stub.active += 1
+        stub.peak = max(stub.peak, stub.active)
+
+        try:
+            await asyncio.sleep(delay)
+
+            if group_openid in failing:
+                raise RuntimeError(group_openid)
+
+            return {"id": group_openid}
+
+        finally:
+            stub.active -= 1
+
+    stub.send_message = send_message
+
+    return stub
+
+
+async def collect(stub: SimpleNamespace, targets, **kwargs) -> list:
+    return [
+        result
+        async for result in SendMessageMixin.broadcast(stub, "hi", targets, **kwargs)
+    ]
+
+
+def test_broadcast_bounds_concurrency_and_reports_failures():
+    stub = bot(failing={"g3"})
+    targets = [f"g{i}" for i in range(10)]
+
+    results = asyncio.run(collect(stub, targets, concurrency=3, done={"g0"}))
+
+    assert stub.peak == 3
+    assert sorted(result["target"] for result in results) == targets[1:]
+
+    (failed,) = (result for result in results if result["error"] is not None)
+
+    assert failed["target"] == "g3"
+    assert isinstance(failed["error"], RuntimeError)
+    assert all(
+        kwargs == {"priority": Priority.LOW, "deadline": None}
+        for _, kwargs in stub.calls
+    )
+
+
+def test_broadcast_streams_results_from_async_targets():
+    stub = bot()
+
+    async def targets():
+        for i in range(3):
+            yield f"g{i}"
+
+    async def main() -> list[str]:
+        seen = []
+
+        async for result in SendMessageMixin.broadcast(
+            stub, "hi", targets(), concurrency=1
+        ):
+            seen.append((result["target"], len(stub.calls)))
+
+        return seen
+
+    assert asyncio.run(main()) == [("g0", 1), ("g1", 2), ("g2", 3)]
+
+
+def test_broadcast_rejects_non_positive_concurrency():
+    with pytest.raises(ValueError, match="concurrency"):
+        asyncio.run(collect(bot(), ["g"], concurrency=0))
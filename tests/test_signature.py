@@ -0,0 +1,33 @@
+from time import time
+
+import pytest
+
+from oibot.signature import key_pair, sign, verify
+
+
+def signed(timestamp: str, body: bytes = b"{}") -> tuple[str, str, bytes]:
+    return sign("secret", timestamp.encode("utf-8") + body), timestamp, body
+
+
+def test_round_trip():
+    assert verify("secret", *signed("1")) is True
+    assert verify("other", *signed("1")) is False
+    assert verify("secret", "not-hex", "1", b"{}") is False
+
+
+@pytest.mark.parametrize(
+    ("offset", "expected"), [(0, True), (-200, True), (-400, False), (400, False)]
+)
+def test_skew_window(offset, expected):
+    assert verify("secret", *signed(str(int(time()) + offset)), skew=300) is expected
+
+
+def test_malformed_timestamp_is_rejected_with_skew():
+    assert verify("secret", *signed("yesterday"), skew=300) is False
+
+
+def test_short_secrets_are_padded_and_empty_rejected():
+    assert key_pair("ab")[0] is key_pair("ab")[0]
+
+    with pytest.raises(ValueError):
+        key_pair("")
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from oibot.api.send_message import Markdown, Media, Message, MsgType, Template
+from oibot.codec import Codec
+
+
+def test_render_splices_values_into_the_static_message():
+    template = Template(
+        Message.markdown(
+            Markdown.content_template("tpl", Template.slot("params")),
+            keyboard={"id": "kb"},
+        )
+    )
+
+    assert template.required == {"params"}
+
+    params = [{"key": "name", "values": ['"alice"\n']}]
+
+    assert json.loads(
+        template.render(Codec.stdlib().dumps, params=params, msg_id="m", msg_seq=2)
+    ) == {
+        "msg_type": MsgType.MARKDOWN,
+        "markdown": {"custom_template_id": "tpl", "params": params},
+        "keyboard": {"id": "kb"},
+        "message_reference": None,
+        "event_id": None,
+        "msg_id": "m",
+        "msg_seq": 2,
+    }
+
+
+def test_render_rejects_unknown_and_missing_values():
+    template = Template(Message.content(Template.slot("content")))
+    dumps = Codec.stdlib().dumps
+
+    with pytest.raises(ValueError, match="unknown"):
+        template.render(dumps, content="hi", extra=1)
+
+    with pytest.raises(ValueError, match="missing"):
+        template.render(dumps, msg_seq=1)
+
+
+def test_media_messages_cannot_be_templated():
+    with pytest.raises(ValueError, match="media"):
+        Template(Message.media(Media(file_info="info")))
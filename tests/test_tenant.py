@@ -0,0 +1,113 @@
+import asyncio
+import json
+from http import HTTPStatus
+from time import time
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from oibot.bot import OiBot
+from oibot.signature import sign
+from oibot.tenant import Tenants
+
+
+def message(id: str) -> bytes:
+    return json.dumps(
+        {
+            "op": 0,
+            "id": id,
+            "t": "C2C_MESSAGE_CREATE",
+            "d": {
+                "id": id,
+                "content": "hi",
+                "author": {"id": "u", "user_openid": "u", "union_openid": "u"},
+                "timestamp": "2026-01-01T00:00:00+08:00",
+                "attachments": [],
+            },
+        }
+    ).encode("utf-8")
+
+
+async def post(
+    client: TestClient,
+    path: str,
+    secret: str,
+    body: bytes,
+    timestamp: str | None = None,
+) -> HTTPStatus:
+    if timestamp is None:
+        timestamp = str(int(time()))
+
+    async with client.post(
+        path,
+        data=body,
+        headers={
+            "X-Signature-Ed25519": sign(secret, timestamp.encode("utf-8") + body),
+            "X-Signature-Timestamp": timestamp,
+        },
+    ) as resp:
+        return HTTPStatus(resp.status)
+
+
+def test_unknown_app_id_shares_default_tenant():
+    tenants = Tenants("app", "secret")
+
+    assert all(tenants.get(str(i)) is tenants.default for i in range(100))
+    assert all(tenants.get(str(i), "chosen") is tenants.default for i in range(100))
+    assert len(tenants) == 0
+
+
+def test_query_secrets_are_opt_in_and_capped():
+    tenants = Tenants(maxsize=4, query_secrets=True)
+
+    for i in range(10):
+        assert tenants.get(str(i), "chosen").app_secret == "chosen"
+
+    assert len(tenants) == 4
+    assert Tenants().get("unknown", "chosen") is None
+
+
+def test_configured_tenant_keeps_its_secret():
+    tenants = Tenants()
+    tenants.register("app", "configured")
+
+    assert tenants.get("app", "chosen").app_secret == "configured"
+
+
+def test_forged_signature_with_query_secret_is_rejected():
+    async def main() -> None:
+        tenants = Tenants("app", "operator-secret", query_secrets=True)
+        tenants.register("unset")
+
+        bot = OiBot(tenants=tenants, verify_signature=True)
+
+        async with TestClient(TestServer(bot.app)) as client:
+            for path in ("/evil?secret=attacker", "/unset?secret=attacker"):
+                assert (
+                    await post(client, path, "attacker", message("1"))
+                    == HTTPStatus.UNAUTHORIZED
+                )
+
+            assert (
+                await post(client, "/evil?secret=attacker", "operator-secret", b"{}")
+                != HTTPStatus.UNAUTHORIZED
+            )
+
+        assert "evil" not in tenants
+
+    asyncio.run(main())
+
+
+def test_stale_signature_timestamp_is_rejected():
+    async def main() -> None:
+        bot = OiBot(app_id="app", app_secret="secret", verify_signature=True)
+
+        async with TestClient(TestServer(bot.app)) as client:
+            for timestamp in (str(int(time()) - 3600), str(int(time()) + 3600)):
+                assert (
+                    await post(client, "/", "secret", b"{}", timestamp)
+                    == HTTPStatus.UNAUTHORIZED
+                )
+
+            assert await post(client, "/", "secret", b"{}") != HTTPStatus.UNAUTHORIZED
+
+    asyncio.run(main())
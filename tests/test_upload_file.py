@@ -0,0 +1,167 @@
+import asyncio
+import json
+from base64 import b64decode, b64encode
+from time import monotonic
+
+import pytest
+
+from oibot.api.upload_file import FileType, MediaSource, UploadCache
+
+
+def uploader(ttl: int = 0, *errors: BaseException) -> tuple[list[int], object]:
+    calls, errors = [], list(errors)
+
+    async def upload() -> dict:
+        calls.append(len(calls))
+
+        await asyncio.sleep(0.01)
+
+        if errors:
+            raise errors.pop(0)
+
+        return {"file_uuid": str(len(calls)), "file_info": "info", "ttl": ttl}
+
+    return calls, upload
+
+
+def test_keys_are_scoped_by_target_and_content():
+    user, group = ("user", "u"), ("group", "g")
+
+    assert UploadCache.key(user, FileType.IMAGE, file_data="YQ==") == UploadCache.key(
+        user, FileType.IMAGE, file_data="YQ=="
+    )
+    assert UploadCache.key(user, FileType.IMAGE, url="u") != UploadCache.key(
+        group, FileType.IMAGE, url="u"
+    )
+    assert UploadCache.key(
+        user, FileType.IMAGE, file_data=MediaSource(b"a")
+    ) == UploadCache.key(user, FileType.IMAGE, file_data=MediaSource(bytearray(b"a")))
+
+    async def chunks():
+        yield b"a"
+
+    assert (
+        UploadCache.key(user, FileType.IMAGE, file_data=MediaSource(chunks())) is None
+    )
+
+
+def test_concurrent_uploads_are_coalesced_and_reused():
+    cache = UploadCache()
+    calls, upload = uploader()
+
+    async def main() -> list[dict]:
+        return await asyncio.gather(*(cache("key", upload) for _ in range(3)))
+
+    assert len({result["file_uuid"] for result in asyncio.run(main())}) == 1
+    assert asyncio.run(cache("key", upload))["file_uuid"] == "1"
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_failed_uploads_are_not_cached():
+    cache = UploadCache()
+    calls, upload = uploader(0, RuntimeError("boom"))
+
+    async def main() -> list:
+        return await asyncio.gather(
+            cache("key", upload), cache("key", upload), return_exceptions=True
+        )
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(main()))
+    assert len(cache) == 0
+    assert asyncio.run(cache("key", upload))["file_uuid"] == "2"
+
+
+def test_entries_expire_before_the_file_info_ttl():
+    cache = UploadCache()
+    calls, upload = uploader(600)
+
+    asyncio.run(cache("key", upload))
+
+    assert cache.entries.lookup("key", monotonic() + 500) is not None
+    assert cache.entries.lookup("key", monotonic() + 545) is None
+
+
+def test_entries_are_evicted_under_memory_pressure():
+    cache = UploadCache(maxsize=2)
+    calls, upload = uploader()
+
+    async def main() -> None:
+        for key in ("a", "b", "c", "a"):
+            await cache(key, upload)
+
+    asyncio.run(main())
+
+    assert len(cache) == 2
+    assert len(calls) == 4
+
+
+def test_zero_ttl_never_expires():
+    cache = UploadCache()
+    calls, upload = uploader(0)
+
+    asyncio.run(cache("key", upload))
+
+    assert cache.entries.lookup("key", monotonic() + 86400) is not None
+
+
+async def read(body) -> bytes:
+    return b"".join([chunk async for chunk in body])
+
+
+def test_body_streams_valid_json_with_an_exact_length(tmp_path):
+    data = bytes(range(256)) * 40
+    (path := tmp_path / "media.bin").write_bytes(data)
+
+    expected = {
+        "file_type": 1,
+        "url": None,
+        "srv_send_msg": False,
+        "file_data": b64encode(data).decode(),
+    }
+
+    for source in (MediaSource(data, chunk_size=3 * 100), MediaSource(path)):
+        body = source.body(file_type=FileType.IMAGE, url=None, srv_send_msg=False)
+
+        for _ in range(2):
+            assert json.loads(payload := asyncio.run(read(body))) == expected
+            assert len(payload) == body.length
+
+        assert body.replayable
+
+
+def test_chunks_stay_bounded():
+    source = MediaSource(bytes(3000), chunk_size=300)
+
+    async def main() -> list[bytes]:
+        return [chunk async for chunk in source]
+
+    assert max(len(chunk) for chunk in asyncio.run(main())) == 400
+
+
+def test_async_iterable_sources_are_streamed_once():
+    data = bytes(range(100))
+
+    async def chunks():
+        for offset in range(0, len(data), 7):
+            yield data[offset : offset + 7]
+
+    source = MediaSource(chunks())
+
+    assert not source.replayable
+    assert source.body().length is None
+
+    async def main() -> bytes:
+        encoded = await read(source)
+
+        with pytest.raises(RuntimeError, match="replayed"):
+            await read(source)
+
+        return encoded
+
+    assert b64decode(asyncio.run(main())) == data
+
+
+def test_chunk_size_must_be_a_multiple_of_three():
+    with pytest.raises(ValueError, match="chunk_size"):
+        MediaSource(b"", chunk_size=4)